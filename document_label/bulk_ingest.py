@@ -0,0 +1,263 @@
+"""Bulk-ingest a folder of PDFs through the gateway.
+
+Extraction, labeling and confirmation (embedding + DB writes) run as
+concurrent stages connected by bounded queues. Every finished file is
+appended to a checkpoint file, so re-running the same command after a
+crash resumes where it stopped.
+
+    python bulk_ingest.py /archive/pdfs --checkpoint ingest.jsonl
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GATEWAY_URL = os.getenv("GATEWAY_URL", "http://localhost:1071")
+FINISHED = {"saved", "duplicate_skipped"}
+
+
+def read_pdf(path):
+    """Read a PDF from disk (runs on the extraction thread pool)."""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.done = 0
+        self.failed = 0
+
+    def rate(self, elapsed):
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+
+class Checkpoint:
+    """Append-only JSON-lines log of finished files."""
+
+    def __init__(self, path):
+        self.path = path
+        self.finished = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line from a crash
+                    if entry.get("status") in FINISHED:
+                        self.finished.add(entry["path"])
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, entries):
+        for entry in entries:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class BulkIngest:
+    def __init__(self, args):
+        self.args = args
+        self.checkpoint = Checkpoint(args.checkpoint)
+        self.stats = {name: StageStats(name) for name in ("extract", "label", "confirm")}
+        self.extract_queue = asyncio.Queue(maxsize=args.queue_size)
+        self.label_queue = asyncio.Queue(maxsize=args.queue_size)
+        self.confirm_queue = asyncio.Queue(maxsize=args.queue_size)
+        self.pool = ThreadPoolExecutor(max_workers=args.extract_workers)
+        self.client = httpx.AsyncClient(
+            base_url=args.gateway,
+            timeout=httpx.Timeout(args.timeout, connect=10),
+            limits=httpx.Limits(max_connections=args.label_concurrency + args.extract_workers + 2)
+        )
+        self.skipped = 0
+        self.started = time.perf_counter()
+
+    def fail(self, stage, item, error):
+        self.stats[stage].failed += 1
+        self.checkpoint.record([{"path": item["path"], "status": "failed", "stage": stage, "error": str(error)}])
+
+    # --- Stages ---
+    async def walk(self):
+        for root, dirs, files in os.walk(self.args.directory):
+            dirs.sort()
+            for name in sorted(files):
+                if not name.lower().endswith(".pdf"):
+                    continue
+                path = os.path.join(root, name)
+                if path in self.checkpoint.finished:
+                    self.skipped += 1
+                    continue
+                await self.extract_queue.put({"path": path})
+
+    async def extract_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.extract_queue.get()
+            try:
+                pdf_bytes = await loop.run_in_executor(self.pool, read_pdf, item["path"])
+                text, ocr_id = await self.extract(item["path"], pdf_bytes)
+                item.update(pdf_bytes=pdf_bytes, content=text, ocr_id=ocr_id)
+                self.stats["extract"].done += 1
+                await self.label_queue.put(item)
+            except Exception as e:
+                self.fail("extract", item, e)
+            finally:
+                self.extract_queue.task_done()
+
+    async def extract(self, path, pdf_bytes):
+        """Stream per-page text from the labeling service.
+
+        The service uses each page's embedded text layer where it is usable
+        and OCRs the rest, the same way /analyze-document does. Returns the
+        text and the id of the extraction output the service stored.
+        """
+        pages = {}
+        files = {"file": (os.path.basename(path), pdf_bytes, "application/pdf")}
+        async with self.client.stream("POST", "/ocr-document", files=files) as response:
+            response.raise_for_status()
+            ocr_id = response.headers.get("x-ocr-id")
+            async for line in response.aiter_lines():
+                if line:
+                    page = json.loads(line)
+                    pages[page["page"]] = page["text"]
+        return "\n\n\n\n".join(pages[i] for i in sorted(pages)).strip(), ocr_id
+
+    async def label_worker(self):
+        while True:
+            item = await self.label_queue.get()
+            try:
+                response = await self.client.post("/analyze-text", json={"content": item["content"]})
+                response.raise_for_status()
+                analysis = response.json()
+                if not analysis.get("labels"):
+                    raise ValueError("No labels returned")
+                item.update(labels=analysis["labels"], summary=analysis.get("summary", ""))
+                self.stats["label"].done += 1
+                await self.confirm_queue.put(item)
+            except Exception as e:
+                self.fail("label", item, e)
+            finally:
+                self.label_queue.task_done()
+
+    async def confirm_worker(self):
+        while True:
+            batch = [await self.confirm_queue.get()]
+            deadline = time.perf_counter() + self.args.batch_wait
+            while len(batch) < self.args.batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.confirm_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self.confirm(batch)
+            finally:
+                for _ in batch:
+                    self.confirm_queue.task_done()
+
+    async def upload(self, item):
+        """Stream the original PDF to the blob store; the confirm call only carries its id."""
+        files = {"file": (os.path.basename(item["path"]), item["pdf_bytes"], "application/pdf")}
+        response = await self.client.post("/blobs", files=files)
+        response.raise_for_status()
+        return response.json()["blob_id"]
+
+    async def confirm(self, batch):
+        try:
+            blob_ids = await asyncio.gather(*(self.upload(item) for item in batch))
+        except Exception as e:
+            for item in batch:
+                self.fail("confirm", item, e)
+            return
+
+        payload = {"documents": [{
+            "title": os.path.splitext(os.path.basename(item["path"]))[0],
+            "content": item["content"],
+            "summary": item["summary"],
+            "labels": item["labels"],
+            "blob_id": blob_id,
+            "ocr_id": item.get("ocr_id")
+        } for item, blob_id in zip(batch, blob_ids)]}
+        try:
+            response = await self.client.post("/confirm-documents", json=payload)
+            response.raise_for_status()
+            results = response.json()["results"]
+        except Exception as e:
+            for item in batch:
+                self.fail("confirm", item, e)
+            return
+
+        self.stats["confirm"].done += len(batch)
+        self.checkpoint.record([
+            {"path": item["path"], "status": result["status"], "document_id": result.get("document_id")}
+            for item, result in zip(batch, results)
+        ])
+
+    # --- Reporting ---
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        parts = [
+            f"{s.name}: {s.done} done, {s.failed} failed, {s.rate(elapsed):.2f} docs/s"
+            for s in self.stats.values()
+        ]
+        print(f"[{elapsed:7.1f}s] " + " | ".join(parts), flush=True)
+
+    async def reporter(self):
+        while True:
+            await asyncio.sleep(self.args.report_interval)
+            self.report()
+
+    async def run(self):
+        workers = (
+            [asyncio.create_task(self.extract_worker()) for _ in range(self.args.extract_workers)]
+            + [asyncio.create_task(self.label_worker()) for _ in range(self.args.label_concurrency)]
+            + [asyncio.create_task(self.confirm_worker()) for _ in range(self.args.confirm_concurrency)]
+            + [asyncio.create_task(self.reporter())]
+        )
+        try:
+            await self.walk()
+            if self.skipped:
+                print(f"Skipping {self.skipped} files already in {self.args.checkpoint}")
+            # Drain the stages in pipeline order
+            await self.extract_queue.join()
+            await self.label_queue.join()
+            await self.confirm_queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await self.client.aclose()
+            self.pool.shutdown()
+            self.checkpoint.close()
+        self.report()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bulk-ingest a folder of PDFs through the gateway.")
+    parser.add_argument("directory", help="Folder to walk recursively for *.pdf files")
+    parser.add_argument("--gateway", default=GATEWAY_URL, help="Gateway base URL")
+    parser.add_argument("--checkpoint", default="ingest_checkpoint.jsonl", help="Progress log used to resume")
+    parser.add_argument("--extract-workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--label-concurrency", type=int, default=4, help="Concurrent /analyze-text calls")
+    parser.add_argument("--confirm-concurrency", type=int, default=1, help="Concurrent /confirm-documents calls")
+    parser.add_argument("--batch-size", type=int, default=16, help="Documents per /confirm-documents call")
+    parser.add_argument("--batch-wait", type=float, default=2.0, help="Max seconds to wait for a full batch")
+    parser.add_argument("--queue-size", type=int, default=64, help="Bound of each inter-stage queue")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    asyncio.run(BulkIngest(parse_args()).run())
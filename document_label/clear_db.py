@@ -1,5 +1,6 @@
 import os
 import chromadb
+import requests
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 
@@ -13,6 +14,9 @@ HOST = os.getenv("POSTGRES_HOST", "localhost")
 PORT = os.getenv("POSTGRES_PORT", "5432")
 
 DATABASE_URL = f"postgresql://{USER}:{PASSWORD}@{HOST}:{PORT}/{DB}"
+# DELETE /vectors is an admin endpoint the gateway does not expose; the embedding
+# service is only reachable on the compose network (or wherever EMBEDDING_URL points)
+EMBEDDING_URL = os.getenv("EMBEDDING_URL", "http://embedding_service:1071")
 
 # ✅ Clear PostgreSQL
 def clear_postgres():
@@ -43,7 +47,17 @@ def clear_chromadb_data():
     except Exception as e:
         print("❌ Failed to clear ChromaDB data:", e)
 
+# ✅ Clear the embedding service's vector store (the NumPy backend lives in its volume)
+def clear_vector_store():
+    try:
+        response = requests.delete(f"{EMBEDDING_URL}/vectors", timeout=60)
+        response.raise_for_status()
+        print(f"✅ Cleared {response.json()['cleared']} vectors from the embedding service.")
+    except Exception as e:
+        print("❌ Failed to clear the embedding service's vector store:", e)
+
 if __name__ == "__main__":
     clear_postgres()
     clear_chromadb_data()
+    clear_vector_store()
     print("✅ All data cleared (collections preserved).")
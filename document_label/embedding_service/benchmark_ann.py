@@ -0,0 +1,98 @@
+"""Compare IVF and compressed scans with exact search: recall@k, latency and memory.
+
+A synthetic corpus of clustered unit vectors (the shape sentence embeddings
+have) is loaded into a NumpyVectorStore in a temporary directory. Queries
+are perturbed corpus vectors; exact top-k from a full scan is the ground
+truth for each compression mode and nprobe setting.
+
+    python benchmark_ann.py --rows 1000000 --nprobe 1 4 16 64 --compression none pq
+"""
+import time
+import tempfile
+import argparse
+import numpy as np
+from services.vector_store import NumpyVectorStore
+
+def synthetic_corpus(rows, dim, clusters, spread, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, rows)] + rng.normal(scale=spread, size=(rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def run_queries(store, queries, k):
+    """Top-k ids and latency in milliseconds of each query, issued one at a time."""
+    ids, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = store.query([query], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append(result["ids"][0])
+    return ids, np.array(latencies)
+
+def report(name, latencies, memory, recall=None):
+    p50, p99 = np.percentile(latencies, [50, 99])
+    recall = f"{recall:8.3f}" if recall is not None else f"{'exact':>8}"
+    print(f"{name:<22}{recall}{p50:10.2f}{p99:10.2f}{1000 / latencies.mean():10.0f}"
+          f"{memory['bytes_per_vector']:10.1f}{memory['bytes_per_document']:12.1f}")
+
+def recall_at_k(found, exact):
+    return np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(found, exact) if b])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=1000, help="Topics in the synthetic corpus")
+    parser.add_argument("--spread", type=float, default=1.5, help="Noise around each topic; higher is harder")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--lists", type=int, default=0, help="IVF lists, 0 for 4 * sqrt(rows)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--compression", nargs="+", default=["none", "float16", "pq"],
+                        choices=["none", "float16", "pq"], help="Scans to compare, each re-ranked at full precision")
+    parser.add_argument("--chunks-per-document", type=int, default=8, help="Vectors per document, for bytes/doc")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = synthetic_corpus(args.rows, args.dim, args.clusters, args.spread, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = vectors[rng.choice(args.rows, args.queries, replace=False)]
+    queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = NumpyVectorStore(directory, dtype=args.dtype)
+        start = time.perf_counter()
+        for i in range(0, args.rows, 10000):
+            batch = range(i, min(i + 10000, args.rows))
+            metadatas = [{"document_id": j // args.chunks_per_document} for j in batch]
+            store.add([str(j) for j in batch], vectors[i:i + len(batch)], [""] * len(batch), metadatas)
+        print(f"Loaded {args.rows} x {args.dim} {args.dtype} vectors in {time.perf_counter() - start:.1f}s")
+
+        print(f"\n{'search':<22}{'recall@' + str(args.k):>8}{'p50 ms':>10}{'p99 ms':>10}{'qps':>10}"
+              f"{'B/vector':>10}{'B/document':>12}")
+        exact, latencies = run_queries(store, queries, args.k)
+        report("flat", latencies, store.memory())
+
+        for compression in args.compression:
+            start = time.perf_counter()
+            store.set_compression(compression)
+            if compression != "none":
+                print(f"{compression} prepared in {time.perf_counter() - start:.1f}s")
+                found, latencies = run_queries(store, queries, args.k)
+                report(f"flat {compression}", latencies, store.memory(), recall_at_k(found, exact))
+
+        start = time.perf_counter()
+        store.build_index(n_lists=args.lists or None)
+        build_seconds = time.perf_counter() - start
+        for compression in args.compression:
+            store.set_compression(compression)
+            for nprobe in args.nprobe:
+                store.nprobe = nprobe
+                found, latencies = run_queries(store, queries, args.k)
+                report(f"ivf {compression} nprobe={nprobe}", latencies, store.memory(), recall_at_k(found, exact))
+        print(f"\nIVF: {store.index.n_lists} lists built in {build_seconds:.1f}s, "
+              f"largest list {store.index.list_sizes().max()} rows")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare embedding backends on our corpus: throughput and recall@k against PyTorch.
+
+The corpus is chunked the same way the service chunks documents. Each
+backend encodes every chunk and every query; recall@k is the overlap of
+its top-k chunks with the PyTorch backend's top-k for the same query.
+
+    python benchmark_encoders.py                      # documents from Postgres
+    python benchmark_encoders.py --corpus-dir texts/  # *.txt files
+"""
+import os
+import time
+import random
+import argparse
+import numpy as np
+from services.chunking import chunk_document
+from services.encoders import get_encoder
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+
+def load_corpus(args):
+    """Return (passages, queries)."""
+    if args.corpus_dir:
+        texts = []
+        for name in sorted(os.listdir(args.corpus_dir)):
+            if name.endswith(".txt"):
+                with open(os.path.join(args.corpus_dir, name), encoding="utf-8") as f:
+                    texts.append(f.read())
+        summaries = []
+    else:
+        from database.operations import get_document_texts
+        rows = get_document_texts(limit=args.limit)
+        texts = [row.content for row in rows if row.content]
+        summaries = [row.summary for row in rows if row.summary]
+
+    passages = [chunk["text"] for text in texts for chunk in chunk_document(text)]
+    rng = random.Random(args.seed)
+    # Summaries read like user queries; otherwise fall back to sampled passages
+    queries = summaries or passages
+    queries = rng.sample(queries, min(args.queries, len(queries)))
+    return passages, queries
+
+def top_k(query_embeddings, passage_embeddings, k):
+    scores = query_embeddings @ passage_embeddings.T
+    k = min(k, scores.shape[1])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row) for row in part]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus-dir", help="Folder of .txt files instead of the documents table")
+    parser.add_argument("--limit", type=int, default=2000, help="Max documents read from Postgres")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    passages, queries = load_corpus(args)
+    if not passages or not queries:
+        raise SystemExit("Corpus is empty")
+    print(f"{len(passages)} passages, {len(queries)} queries, k={args.k}")
+
+    reference = None
+    rows = []
+    for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+        encoder = get_encoder(backend)
+        encoder.encode(passages[:args.batch_size], batch_size=args.batch_size)  # warm-up
+
+        start = time.perf_counter()
+        passage_embeddings = encoder.encode(passages, batch_size=args.batch_size)
+        seconds = time.perf_counter() - start
+        query_embeddings = encoder.encode(queries, batch_size=args.batch_size)
+        hits = top_k(query_embeddings, passage_embeddings, args.k)
+
+        if reference is None:
+            reference = (passage_embeddings, hits)
+            recall, cosine = 1.0, 1.0
+        else:
+            recall = float(np.mean([len(h & r) / len(r) for h, r in zip(hits, reference[1])]))
+            cosine = float(np.mean(np.sum(passage_embeddings * reference[0], axis=1)))
+        if backend in args.backends:
+            rows.append((backend, len(passages) / seconds, recall, cosine))
+
+    print(f"{'backend':<10} {'passages/s':>11} {'recall@' + str(args.k):>10} {'cos vs torch':>13}")
+    for backend, throughput, recall, cosine in rows:
+        print(f"{backend:<10} {throughput:>11.1f} {recall:>10.3f} {cosine:>13.4f}")
+
+if __name__ == "__main__":
+    main()
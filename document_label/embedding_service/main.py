@@ -1,13 +1,61 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from services.embedding_utils import save_document_embedding, is_duplicate, semantic_search
-from database.operations import create_document, add_label_to_document
+import os
+import json
+import logging
+from typing import Literal, Optional
+from datetime import datetime
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from services.embedding_utils import (
+    save_document_embedding, save_document_embeddings, semantic_search, batcher, get_store
+)
+from services.dedup import screen, stats as dedup_stats
+from services.hybrid_search import hybrid_search
+from services.blob_store import BlobStore
+from services import search_cache, search_cursor, lazy
+from database.operations import create_document, delete_documents
 
+# Results in the first streamed page; each following page is twice as large
+SEARCH_STREAM_FIRST_PAGE = int(os.getenv("SEARCH_STREAM_FIRST_PAGE", "10"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Chroma and the encoder load on first use; warm-up only moves that off the first request
+    if lazy.WARMUP_ON_STARTUP:
+        lazy.warm_up()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+# Original files; documents only keep the blob id
+blob_store = BlobStore()
+
+
+class SearchFilters(BaseModel):
+    # Documents carrying any of these labels (case-insensitive)
+    labels: list[str] = []
+    uploaded_from: Optional[datetime] = None
+    uploaded_to: Optional[datetime] = None
+    # Case-insensitive exact title
+    title: Optional[str] = None
 
-app = FastAPI()
 
 class SearchInput(BaseModel):
     query: str
+    # "hybrid" fuses the vector ranking with Postgres full-text matches on content and labels
+    mode: Literal["vector", "hybrid"] = "vector"
+    # Results per response; a streamed response fetches them in growing pages
+    top_k: int = Field(3, ge=1, le=1000)
+    offset: int = Field(0, ge=0)
+    # next_cursor of the previous page; takes the place of offset
+    cursor: Optional[str] = None
+    filters: SearchFilters = SearchFilters()
+    # Matched chunk text instead of summary, labels and chunk offsets
+    snippets: bool = False
+    # NDJSON: one {"result": ...} line per document as soon as its page is ready, then a {"done": true, ...} line
+    stream: bool = False
 
 
 class ConfirmInput(BaseModel):
@@ -15,38 +63,141 @@ class ConfirmInput(BaseModel):
     content: str
     summary: str
     labels: list[str]
-    file_bytes: bytes
+    # Id returned by POST /blobs; preferred over inline file_bytes (base64 in JSON)
+    blob_id: Optional[str] = None
+    file_bytes: Optional[bytes] = None
+    # From /analyze-document or /ocr-document; links the stored OCR output to the document
+    ocr_id: Optional[str] = Field(None, pattern="^[0-9a-f]{64}$")
+
+
+class ConfirmBatchInput(BaseModel):
+    documents: list[ConfirmInput]
+
+
+def search_page(data: SearchInput, top_k: int, cursor: Optional[str]) -> dict:
+    """One page of results through the result cache, with the cursor of the page after it."""
+    filters = data.filters.model_dump()
+    search_id = search_cursor.fingerprint(data.mode, data.query, filters)
+    position, after = search_cursor.decode(cursor, search_id) if cursor else (data.offset, None)
+    key = search_cache.result_key(
+        mode=data.mode, query=data.query, top_k=top_k, offset=position, after=after,
+        snippets=data.snippets, filters=filters
+    )
+    cached = search_cache.search_result_cache.get(key)
+    if cached is not None:
+        return {**cached, "cache_hit": True}
+
+    if data.mode == "hybrid":
+        response = hybrid_search(data.query, top_k=top_k, offset=position, filters=filters,
+                                 after=after, snippets=data.snippets)
+    else:
+        # One extra result tells whether another page exists
+        results = semantic_search(data.query, top_k=top_k + 1, offset=position, filters=filters,
+                                  after=after, snippets=data.snippets)
+        response = {"results": results[:top_k], "has_more": len(results) > top_k}
+    results = response["results"]
+    response["next_cursor"] = search_cursor.encode(search_id, position + len(results), results[-1]) \
+        if response["has_more"] and results else None
+    search_cache.search_result_cache.set(key, response)
+    return {**response, "cache_hit": False}
+
+
+def stream_search(data: SearchInput):
+    """NDJSON lines for up to data.top_k results, fetched a page at a time so the first arrive early."""
+    cursor, remaining, page_size, returned = data.cursor, data.top_k, SEARCH_STREAM_FIRST_PAGE, 0
+    try:
+        while remaining > 0:
+            page = search_page(data, min(page_size, remaining), cursor)
+            for result in page["results"]:
+                yield json.dumps({"result": result}, default=str) + "\n"
+            returned += len(page["results"])
+            remaining -= len(page["results"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+            page_size *= 2
+        yield json.dumps({"done": True, "returned": returned, "next_cursor": cursor}) + "\n"
+    except Exception as e:
+        # Headers are already sent; the error becomes the last line
+        logging.exception("Streamed search failed")
+        yield json.dumps({"done": True, "returned": returned, "error": str(e)}) + "\n"
+
 
 @app.post("/search")
 def search(data: SearchInput):
     try:
-        results = semantic_search(data.query)
-        cleaned = []
-
-        for i, doc_id in enumerate(results["ids"][0]):
-            cleaned.append({
-                "document_id": results["metadatas"][0][i]["document_id"],
-                "summary": results["metadatas"][0][i]["summary"],
-                "labels": results["metadatas"][0][i]["labels"],
-                "score": results["distances"][0][i],
-            })
-
-        return {"results": cleaned}
+        if data.cursor:
+            # Rejected here so a streamed response never starts with a bad cursor
+            search_cursor.decode(data.cursor, search_cursor.fingerprint(
+                data.mode, data.query, data.filters.model_dump()
+            ))
+        if data.stream:
+            return StreamingResponse(stream_search(data), media_type="application/x-ndjson")
+        return search_page(data, data.top_k, data.cursor)
+    except search_cursor.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
     
 
+def check_blob(data: ConfirmInput):
+    """400 unless the document's file was sent inline or uploaded to /blobs; stores nothing."""
+    if data.blob_id:
+        if not blob_store.exists(data.blob_id):
+            raise HTTPException(status_code=400, detail=f"Unknown blob_id {data.blob_id}; upload it to /blobs first")
+        return
+    if not data.file_bytes:
+        raise HTTPException(status_code=400, detail="Title, content, labels, and a file are required")
+
+
+def store_blob(data: ConfirmInput) -> str:
+    """Blob id of the document's file, storing inline file_bytes first; only for documents being saved."""
+    return data.blob_id or blob_store.put_bytes(data.file_bytes)[0]
+
+
+@app.post("/blobs")
+def upload_blob(file: UploadFile = File(...)):
+    """Store an uploaded file, streamed to disk in chunks; identical files are stored once."""
+    try:
+        blob_id, size, deduplicated = blob_store.put_stream(file.file)
+        return {"blob_id": blob_id, "size": size, "deduplicated": deduplicated}
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
+
+
+@app.get("/blobs/{blob_id}")
+def download_blob(blob_id: str):
+    if not blob_store.exists(blob_id):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return FileResponse(blob_store.path(blob_id), media_type="application/octet-stream")
+
+
 @app.post("/confirm-document")
 def confirm_document(data: ConfirmInput):
-    if not data.content or not data.labels or not data.title or not data.file_bytes:
-        raise HTTPException(status_code=400, detail="Title, content, labels, and file bytes are required")
+    if not data.content or not data.labels or not data.title:
+        raise HTTPException(status_code=400, detail="Title, content, labels, and a file are required")
+    check_blob(data)
+
+    # Exact hash, then MinHash, then vectors; the embedding is only computed
+    # when needed and is reused for the insert
+    screened, dedup_timings = screen([data.content])
+    item = screened[0]
+    dedup = {
+        "layer": item["layer"],
+        "match": item["match"],
+        "similarity": item["similarity"],
+        "timings_ms": dedup_timings
+    }
 
-    if is_duplicate(data.content):
+    if item["duplicate"]:
         return {
             "status": "duplicate_skipped",
-            "message": "A similar document already exists. Skipping save."
+            "message": "A similar document already exists. Skipping save.",
+            "dedup": dedup
         }
 
     # Save document to DB
@@ -54,23 +205,169 @@ def confirm_document(data: ConfirmInput):
         title=data.title,
         content=data.content,
         summary=data.summary,
-        file_bytes=data.file_bytes  # store as binary/blob
+        blob_id=store_blob(data),
+        labels=data.labels,
+        content_hash=item["content_hash"],
+        minhash=item["minhash"],
+        ocr_id=data.ocr_id
     )
 
-    for label in data.labels:
-        add_label_to_document(document.document_id, label)
-
-    save_document_embedding(
-        document_id=document.document_id,
-        content=data.content,
-        summary=data.summary,
-        labels=data.labels
-    )
+    try:
+        save_document_embedding(
+            document_id=document.document_id,
+            content=data.content,
+            summary=data.summary,
+            labels=data.labels,
+            embedded=item["embedded"],
+            title=document.title,
+            uploaded_at=document.uploaded_at
+        )
+    except Exception:
+        # A row without vectors is never found, and its hash would skip every retry as a duplicate
+        delete_documents([document.document_id])
+        raise
 
     return {
         "status": "saved",
         "document_id": document.document_id,
         "title": data.title,
         "labels": data.labels,
-        "summary": data.summary
+        "summary": data.summary,
+        "dedup": dedup
     }
+
+
+@app.post("/confirm-documents")
+def confirm_documents(data: ConfirmBatchInput):
+    if not data.documents:
+        raise HTTPException(status_code=400, detail="At least one document is required")
+    for item in data.documents:
+        if not item.content or not item.labels or not item.title:
+            raise HTTPException(status_code=400, detail="Title, content, labels, and a file are required")
+        check_blob(item)
+
+    # Dedup layers run batch-wide: one hash lookup, one LSH lookup, one
+    # encode call and one vector query for the documents that get that far
+    screened, dedup_timings = screen([item.content for item in data.documents])
+
+    results = []
+    to_embed = []
+    try:
+        for item, dedup in zip(data.documents, screened):
+            if dedup["duplicate"]:
+                results.append({
+                    "status": "duplicate_skipped",
+                    "title": item.title,
+                    "message": "A similar document already exists. Skipping save.",
+                    "dedup": {"layer": dedup["layer"], "match": dedup["match"], "similarity": dedup["similarity"]}
+                })
+                continue
+
+            document = create_document(
+                title=item.title,
+                content=item.content,
+                summary=item.summary,
+                blob_id=store_blob(item),
+                labels=item.labels,
+                content_hash=dedup["content_hash"],
+                minhash=dedup["minhash"],
+                ocr_id=item.ocr_id
+            )
+
+            to_embed.append({
+                "document_id": document.document_id,
+                "content": item.content,
+                "summary": item.summary,
+                "labels": item.labels,
+                "embedded": dedup["embedded"],
+                "title": document.title,
+                "uploaded_at": document.uploaded_at
+            })
+            results.append({
+                "status": "saved",
+                "document_id": document.document_id,
+                "title": item.title,
+                "labels": item.labels,
+                "summary": item.summary
+            })
+
+        save_document_embeddings(to_embed)
+    except Exception:
+        # Same as /confirm-document: documents of a failed batch leave no rows behind
+        delete_documents([doc["document_id"] for doc in to_embed])
+        raise
+
+    return {
+        "saved": len(to_embed),
+        "skipped": len(results) - len(to_embed),
+        "results": results,
+        "dedup_timings_ms": dedup_timings
+    }
+
+
+@app.get("/search/cache/stats")
+def get_search_cache_stats():
+    return search_cache.stats()
+
+
+@app.get("/encoder/stats")
+def get_encoder_stats():
+    """Micro-batching counters: requests coalesced per forward pass."""
+    return batcher.stats() if batcher is not None else {"enabled": False}
+
+
+@app.get("/vectors/stats")
+def get_vector_stats():
+    """Backend, vector count and (for the NumPy backend) matrix layout and size."""
+    return get_store().stats()
+
+
+@app.post("/vectors/index")
+def build_vector_index():
+    """(Re)train the IVF index of the NumPy backend in the background."""
+    store = get_store()
+    if not hasattr(store, "build_index"):
+        raise HTTPException(status_code=400, detail=f"The {store.name} backend manages its own index")
+    store.build_index(background=True)
+    return {"status": "building"}
+
+
+@app.delete("/vectors")
+def clear_vectors():
+    """Remove every stored vector; clear_db.py calls this when the database is reset. Not proxied by the gateway."""
+    try:
+        cleared = get_store().clear()
+        search_cache.bump_collection_version()
+        return {"cleared": cleared}
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
+
+
+@app.get("/dedup/stats")
+def get_dedup_stats():
+    """Hit rate and latency of each dedup layer since the service started."""
+    return dedup_stats.snapshot()
+
+
+# --- Health ---
+@app.get("/health/live")
+def liveness():
+    """The process is up and serving requests."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+def readiness():
+    """503 until Chroma is reachable and the encoder is loaded (or one of them failed to load)."""
+    report = lazy.startup_report()
+    if not report["ready"]:
+        return JSONResponse(status_code=503, content={"status": "not_ready", **report})
+    return {"status": "ready", **report}
+
+
+@app.get("/health/startup")
+def startup_report():
+    """Load time of each lazily initialised component."""
+    return lazy.startup_report()
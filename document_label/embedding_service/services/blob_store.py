@@ -0,0 +1,71 @@
+import os
+import re
+import hashlib
+import tempfile
+from io import BytesIO
+
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "blobs")
+# Read/write granularity when streaming blobs in and out
+BLOB_CHUNK_SIZE = int(os.getenv("BLOB_CHUNK_SIZE", str(1024 * 1024)))
+
+_BLOB_ID = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobStore:
+    """Content-addressed file store: a blob's id is the SHA-256 of its bytes.
+
+    Identical uploads share one file, and files are never modified after
+    they are written, so readers need no locking.
+    """
+
+    def __init__(self, directory: str = BLOB_STORE_DIR):
+        self.directory = directory
+        self._tmp_dir = os.path.join(directory, "tmp")
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+    @staticmethod
+    def is_blob_id(blob_id: str) -> bool:
+        return bool(blob_id and _BLOB_ID.match(blob_id))
+
+    def path(self, blob_id: str) -> str:
+        if not self.is_blob_id(blob_id):
+            raise ValueError(f"Invalid blob id: {blob_id!r}")
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.directory, blob_id[:2], blob_id[2:4], blob_id)
+
+    def exists(self, blob_id: str) -> bool:
+        return self.is_blob_id(blob_id) and os.path.exists(self.path(blob_id))
+
+    def put_stream(self, stream):
+        """Copy a binary file-like object into the store chunk by chunk.
+
+        Returns (blob_id, size, deduplicated); ``deduplicated`` is True when
+        the same bytes were already stored.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while chunk := stream.read(BLOB_CHUNK_SIZE):
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            blob_id = digest.hexdigest()
+            path = self.path(blob_id)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+                return blob_id, size, True
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            return blob_id, size, False
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put_bytes(self, data: bytes):
+        blob_id = hashlib.sha256(data).hexdigest()
+        if self.exists(blob_id):
+            return blob_id, len(data), True
+        return self.put_stream(BytesIO(data))
@@ -0,0 +1,67 @@
+import os
+import re
+
+# The encoder truncates at 128 word pieces; ~80 Turkish words stay under that
+CHUNK_MAX_WORDS = int(os.getenv("CHUNK_MAX_WORDS", "80"))
+CHUNK_OVERLAP_WORDS = int(os.getenv("CHUNK_OVERLAP_WORDS", "20"))
+
+# docTR renders page breaks as blank-line runs; text-layer PDFs may use form feeds
+_PAGE_BREAK = re.compile(r"\f|\n\s*\n\s*\n")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+")
+_WHITESPACE = re.compile(r"\s+")
+
+def _split_spans(text: str, start: int, end: int, separator):
+    """(start, end) offsets of the non-blank pieces of text[start:end]."""
+    spans = []
+    pos = start
+    for match in separator.finditer(text, start, end):
+        if text[pos:match.start()].strip():
+            spans.append((pos, match.start()))
+        pos = match.end()
+    if text[pos:end].strip():
+        spans.append((pos, end))
+    return spans
+
+def _sentence_units(text: str, start: int, end: int, max_words: int):
+    """Sentences of a page as (start, end, word_count); overlong ones are cut on word boundaries."""
+    units = []
+    for s, e in _split_spans(text, start, end, _SENTENCE_BREAK):
+        words = _split_spans(text, s, e, _WHITESPACE)
+        for i in range(0, len(words), max_words):
+            piece = words[i:i + max_words]
+            units.append((piece[0][0], piece[-1][1], len(piece)))
+    return units
+
+def chunk_document(text: str, max_words=CHUNK_MAX_WORDS, overlap_words=CHUNK_OVERLAP_WORDS):
+    """Split text into overlapping windows of whole sentences that never cross a page break.
+
+    Returns a list of {"text", "start", "end", "page"} dicts with character
+    offsets into ``text``.
+    """
+    chunks = []
+    for page, (page_start, page_end) in enumerate(_split_spans(text, 0, len(text), _PAGE_BREAK)):
+        window = []
+        count = 0
+        for unit in _sentence_units(text, page_start, page_end, max_words):
+            if window and count + unit[2] > max_words:
+                chunks.append(_chunk(text, window, page))
+                # Carry trailing sentences into the next window as overlap
+                tail = []
+                tail_count = 0
+                for prev in reversed(window):
+                    if tail_count + prev[2] > overlap_words:
+                        break
+                    tail.insert(0, prev)
+                    tail_count += prev[2]
+                window, count = tail, tail_count
+                while window and count + unit[2] > max_words:
+                    count -= window.pop(0)[2]
+            window.append(unit)
+            count += unit[2]
+        if window:
+            chunks.append(_chunk(text, window, page))
+    return chunks
+
+def _chunk(text: str, window, page: int):
+    start, end = window[0][0], window[-1][1]
+    return {"text": text[start:end], "start": start, "end": end, "page": page}
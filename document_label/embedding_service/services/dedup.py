@@ -0,0 +1,126 @@
+import os
+import time
+import hashlib
+import threading
+from services import minhash
+from services.embedding_utils import embed_documents, find_duplicates, find_batch_duplicates
+from database.operations import find_documents_by_content_hash, find_minhash_candidates
+
+# Estimated Jaccard similarity of character shingles
+DEDUP_MINHASH_THRESHOLD = float(os.getenv("DEDUP_MINHASH_THRESHOLD", "0.9"))
+# Cosine similarity of chunk embeddings
+DEDUP_VECTOR_THRESHOLD = float(os.getenv("DEDUP_VECTOR_THRESHOLD", "0.95"))
+
+LAYERS = ("exact", "minhash", "vector")
+
+
+class DedupStats:
+    """Per-layer counters since process start: items checked, duplicates found, time spent."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._layers = {layer: {"checks": 0, "hits": 0, "seconds": 0.0} for layer in LAYERS}
+
+    def record(self, layer: str, checks: int, hits: int, seconds: float):
+        with self._lock:
+            counters = self._layers[layer]
+            counters["checks"] += checks
+            counters["hits"] += hits
+            counters["seconds"] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                layer: {
+                    "checks": c["checks"],
+                    "hits": c["hits"],
+                    "hit_rate": c["hits"] / c["checks"] if c["checks"] else 0.0,
+                    "avg_ms_per_item": 1000 * c["seconds"] / c["checks"] if c["checks"] else 0.0
+                }
+                for layer, c in self._layers.items()
+            }
+
+
+stats = DedupStats()
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+def _mark(result: dict, layer: str, match: dict, similarity: float):
+    result.update(duplicate=True, layer=layer, match=match, similarity=similarity)
+
+def screen(contents: list[str]):
+    """Run the dedup layers over a batch, cheapest first.
+
+    Each layer only sees what the previous ones let through, so exact and
+    near-identical re-uploads never reach the embedding model. Matches
+    against earlier items of the same batch count too.
+
+    Returns (results, timings_ms). Each result has duplicate, layer, match
+    and similarity, plus the content_hash, minhash and embedded values to
+    store with a new document.
+    """
+    results = [{"duplicate": False, "layer": None, "match": None, "similarity": None} for _ in contents]
+    timings = {}
+
+    # Layer 1: exact hash of the whitespace-normalized content
+    start = time.perf_counter()
+    for content, result in zip(contents, results):
+        result["content_hash"] = content_hash(content)
+    stored = find_documents_by_content_hash({r["content_hash"] for r in results})
+    seen = {}
+    for i, result in enumerate(results):
+        h = result["content_hash"]
+        if h in stored:
+            _mark(result, "exact", {"document_id": stored[h]}, 1.0)
+        elif h in seen:
+            _mark(result, "exact", {"batch_index": seen[h]}, 1.0)
+        else:
+            seen[h] = i
+    _finish_layer("exact", results, range(len(results)), start, timings)
+
+    # Layer 2: MinHash signatures, candidates from shared LSH buckets
+    pending = [i for i, r in enumerate(results) if not r["duplicate"]]
+    start = time.perf_counter()
+    signatures = {}
+    for i in pending:
+        signatures[i] = minhash.signature(contents[i])
+        results[i]["minhash"] = (minhash.to_bytes(signatures[i]), minhash.band_buckets(signatures[i]))
+    all_bands = {band for i in pending for band in results[i]["minhash"][1]}
+    candidates = {
+        document_id: minhash.from_bytes(sig)
+        for document_id, sig in (find_minhash_candidates(list(all_bands)) if all_bands else {}).items()
+    }
+    accepted = []
+    for i in pending:
+        scored = [({"document_id": d}, minhash.jaccard(signatures[i], sig)) for d, sig in candidates.items()]
+        scored += [({"batch_index": j}, minhash.jaccard(signatures[i], signatures[j])) for j in accepted]
+        match, similarity = max(scored, key=lambda s: s[1], default=(None, 0.0))
+        if similarity >= DEDUP_MINHASH_THRESHOLD:
+            _mark(results[i], "minhash", match, similarity)
+        else:
+            accepted.append(i)
+    _finish_layer("minhash", results, pending, start, timings)
+
+    # Layer 3: chunk embeddings against the vector store
+    pending = accepted
+    start = time.perf_counter()
+    embedded = embed_documents([contents[i] for i in pending]) if pending else []
+    stored_matches = find_duplicates(embedded, threshold=DEDUP_VECTOR_THRESHOLD)
+    batch_repeats = find_batch_duplicates(embedded, threshold=DEDUP_VECTOR_THRESHOLD)
+    for i, doc_embedded, match, repeat in zip(pending, embedded, stored_matches, batch_repeats):
+        results[i]["embedded"] = doc_embedded
+        if match:
+            _mark(results[i], "vector", {"document_id": match["document_id"]}, match["similarity"])
+        elif repeat is not None:
+            _mark(results[i], "vector", {"batch_index": pending[repeat]}, None)
+    _finish_layer("vector", results, pending, start, timings)
+
+    return results, timings
+
+def _finish_layer(layer: str, results, indices, start: float, timings: dict):
+    seconds = time.perf_counter() - start
+    indices = list(indices)
+    hits = sum(1 for i in indices if results[i]["layer"] == layer)
+    stats.record(layer, len(indices), hits, seconds)
+    timings[layer] = round(1000 * seconds, 2)
@@ -1,50 +1,316 @@
-import chromadb
-from sentence_transformers import SentenceTransformer
+import os
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+from services.chunking import chunk_document
+from services.encoders import get_encoder
+from services.vector_store import get_vector_store
+from services.micro_batcher import MicroBatcher, MICROBATCH_ENABLED
+from services.lazy import LazyResource
+from services.search_cache import query_embedding_cache, normalize_query, bump_collection_version
+from services.search_cursor import order_key, page_after
 
-client = chromadb.HttpClient(host="chromadb", port=8000)
-collection = client.get_or_create_collection("documents")
+# Texts per forward pass when encoding batches; larger is faster until memory runs out
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+# Chunk hits fetched per requested document, before grouping by document
+CHUNK_SEARCH_OVERSAMPLE = int(os.getenv("CHUNK_SEARCH_OVERSAMPLE", "5"))
+# "max": best chunk decides, "sum": documents matching in many places rank higher.
+# "sum" scores depend on how many chunks were fetched, which grows with the
+# page, so consecutive pages (offset or cursor) may repeat or skip documents
+CHUNK_SCORE_AGGREGATION = os.getenv("CHUNK_SCORE_AGGREGATION", "max")
+# Share of a new document's chunks that must match one stored document to call it a duplicate
+DUPLICATE_CHUNK_RATIO = float(os.getenv("DUPLICATE_CHUNK_RATIO", "0.8"))
+# Chroma rejects oversized add() calls
+CHROMA_ADD_BATCH = int(os.getenv("CHROMA_ADD_BATCH", "1000"))
+# Matched chunks returned per document, and characters of each, when snippets are requested
+SEARCH_SNIPPETS_PER_DOCUMENT = int(os.getenv("SEARCH_SNIPPETS_PER_DOCUMENT", "3"))
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "300"))
 
-embedding_model = SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
+# Neither the vector store nor the model is touched at import time.
+# Chroma or the in-process NumPy index, selected by VECTOR_BACKEND
+vector_store = LazyResource("vector_store", get_vector_store)
+# PyTorch or ONNX Runtime, selected by EMBEDDING_BACKEND
+encoder = LazyResource("encoder", get_encoder)
+# Concurrent requests share forward passes on one encoder thread
+batcher = MicroBatcher(lambda texts: encoder.get().encode(texts, batch_size=EMBEDDING_BATCH_SIZE)) \
+    if MICROBATCH_ENABLED else None
 
-def create_embedding(text: str):
-    return embedding_model.encode(text).tolist()
+def get_store():
+    return vector_store.get()
 
-def is_duplicate(content: str, threshold=0.95):
-    """Check if content embedding is similar to existing docs."""
-    embedding = create_embedding(content)
-    if collection.count() == 0:
-        return False
+def _encode(texts: list[str], batch_size=EMBEDDING_BATCH_SIZE):
+    if batcher is not None:
+        return batcher.encode(texts)
+    return encoder.get().encode(texts, batch_size=batch_size)
 
-    results = collection.query(query_embeddings=[embedding], n_results=1)
+# Vectors stay float32 NumPy arrays from the encoder to the vector store;
+# only the Chroma backend turns them into lists, at its HTTP boundary.
+def create_embedding(text: str) -> np.ndarray:
+    return _encode([text])[0]
 
-    if results["distances"] and len(results["distances"][0]) > 0:
-        # Chroma distances are L2, convert to cosine similarity manually if needed
-        # For simplicity, treat 1 - distance as similarity approximation
-        distance = results["distances"][0][0]
-        similarity = 1 - distance if distance <= 1 else 0
-        return similarity >= threshold
-    return False
+def embed_query(query: str):
+    """Embedding of the query, served from the LRU/TTL cache (keyed by the normalized query) when possible."""
+    key = normalize_query(query)
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        embedding = create_embedding(query)
+        query_embedding_cache.set(key, embedding)
+    return embedding
 
-def save_document_embedding(document_id: int, content: str, summary: str, labels: list[str]):
-    embedding = create_embedding(content)
+def create_embeddings(texts: list[str], batch_size=EMBEDDING_BATCH_SIZE) -> np.ndarray:
+    """Encode many texts in a single encode call; one row per text."""
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return _encode(texts, batch_size=batch_size)
 
-    metadata = {
-        "document_id": document_id,
-        "summary": summary,
-        "labels": ", ".join(labels) if labels else ""
-    }
+def embed_documents(contents: list[str]):
+    """Chunk every document and encode all chunks in one batch.
 
-    collection.add(
-        ids=[str(document_id)],
-        embeddings=[embedding],
-        documents=[content],
-        metadatas=[metadata]
+    Returns one (chunks, embeddings) pair per document; embeddings is a
+    view of one float32 matrix, one row per chunk.
+    """
+    chunked = [chunk_document(content) or [_whole(content)] for content in contents]
+    flat = create_embeddings([chunk["text"] for chunks in chunked for chunk in chunks])
+
+    embedded = []
+    pos = 0
+    for chunks in chunked:
+        embedded.append((chunks, flat[pos:pos + len(chunks)]))
+        pos += len(chunks)
+    return embedded
+
+def _whole(content: str):
+    return {"text": content, "start": 0, "end": len(content), "page": 0}
+
+def _similarity(distance: float):
+    """Cosine similarity from a vector store distance (embeddings are unit length)."""
+    if get_store().space == "l2":
+        # Chroma reports squared L2, and |a - b|^2 = 2 - 2cos for unit vectors
+        return 1 - distance / 2
+    # "cosine" and "ip" both report 1 - dot product
+    return 1 - distance
+
+def find_duplicates(embedded: list, threshold=0.95):
+    """Check many chunked documents against stored chunks with one query.
+
+    A document is a duplicate when DUPLICATE_CHUNK_RATIO of its chunks each
+    closely match a chunk of the same stored document. Returns, per input,
+    None or {"document_id", "similarity"} of the matched document.
+    """
+    if not embedded or get_store().count() == 0:
+        return [None] * len(embedded)
+
+    results = get_store().query(
+        query_embeddings=np.vstack([embeddings for _, embeddings in embedded]),
+        n_results=1,
+        include=["metadatas", "distances"]
     )
-    print(f"Saved embedding for document {document_id}")
 
-def semantic_search(query: str, top_k=3):
-    query_embedding = create_embedding(query)
-    results = collection.query(query_embeddings=[query_embedding], n_results=top_k)
-    return results
+    duplicates = []
+    pos = 0
+    for chunks, _ in embedded:
+        matches = defaultdict(list)
+        for distances, metadatas in zip(results["distances"][pos:pos + len(chunks)],
+                                        results["metadatas"][pos:pos + len(chunks)]):
+            similarity = _similarity(distances[0]) if distances else 0
+            if similarity >= threshold:
+                matches[metadatas[0]["document_id"]].append(similarity)
+        pos += len(chunks)
+
+        best = max(matches.items(), key=lambda m: len(m[1]), default=None)
+        if best and len(best[1]) / len(chunks) >= DUPLICATE_CHUNK_RATIO:
+            duplicates.append({"document_id": best[0], "similarity": float(np.mean(best[1]))})
+        else:
+            duplicates.append(None)
+    return duplicates
+
+def find_batch_duplicates(embedded: list, threshold=0.95):
+    """Index of the earlier item of the same batch each item repeats, or None.
+
+    Items are compared by their mean chunk vector.
+    """
+    if len(embedded) < 2:
+        return [None] * len(embedded)
+    centroids = np.asarray([np.mean(embeddings, axis=0) for _, embeddings in embedded])
+    similarity = cosine_similarity(centroids)
+    repeats = []
+    for i in range(len(embedded)):
+        earlier = np.flatnonzero(similarity[i, :i] >= threshold)
+        repeats.append(int(earlier[0]) if len(earlier) else None)
+    return repeats
+
+# --- Filterable metadata ---
+def label_key(label: str) -> str:
+    """Metadata key flagging a label; Chroma can only filter on scalar values."""
+    return "label:" + label.strip().lower()
+
+def to_epoch(value: datetime) -> int:
+    """Seconds since the epoch; naive datetimes are UTC like documents.uploaded_at."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+def _filter_metadata(labels: list[str], title: str = None, uploaded_at: datetime = None):
+    metadata = {label_key(label): True for label in labels or [] if label.strip()}
+    if title:
+        metadata["title"] = title
+        metadata["title_lower"] = title.lower()
+    if uploaded_at:
+        metadata["uploaded_at"] = to_epoch(uploaded_at)
+    return metadata
+
+def chroma_where(filters: dict = None):
+    """Translate search filters into a Chroma where clause (None when unfiltered).
+
+    Supported keys: labels (any of), uploaded_from, uploaded_to, title (case-insensitive exact).
+    """
+    if not filters:
+        return None
+    conditions = []
+    labels = [label for label in filters.get("labels") or [] if label.strip()]
+    if len(labels) == 1:
+        conditions.append({label_key(labels[0]): True})
+    elif labels:
+        conditions.append({"$or": [{label_key(label): True} for label in labels]})
+    if filters.get("uploaded_from"):
+        conditions.append({"uploaded_at": {"$gte": to_epoch(filters["uploaded_from"])}})
+    if filters.get("uploaded_to"):
+        conditions.append({"uploaded_at": {"$lte": to_epoch(filters["uploaded_to"])}})
+    if filters.get("title"):
+        conditions.append({"title_lower": filters["title"].lower()})
+
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+def _chunk_records(document_id: int, summary: str, labels: list[str], chunks, embeddings,
+                   title: str = None, uploaded_at: datetime = None):
+    filterable = _filter_metadata(labels, title, uploaded_at)
+    for index, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+        yield (
+            f"{document_id}:{index}",
+            embedding,
+            chunk["text"],
+            {
+                "document_id": document_id,
+                "chunk_index": index,
+                "start": chunk["start"],
+                "end": chunk["end"],
+                "page": chunk["page"],
+                "summary": summary,
+                "labels": ", ".join(labels) if labels else "",
+                **filterable
+            }
+        )
+
+def _add_records(records: list):
+    """Add records in CHROMA_ADD_BATCH slices; if one fails, the slices already added are removed again."""
+    try:
+        for i in range(0, len(records), CHROMA_ADD_BATCH):
+            ids, embeddings, documents, metadatas = zip(*records[i:i + CHROMA_ADD_BATCH])
+            get_store().add(
+                ids=list(ids),
+                embeddings=np.vstack(embeddings),
+                documents=list(documents),
+                metadatas=list(metadatas)
+            )
+    except Exception:
+        try:
+            get_store().delete(ids=[record[0] for record in records])
+        except Exception:
+            logging.exception("Could not remove partially added chunk embeddings")
+        raise
+
+def save_document_embedding(document_id: int, content: str, summary: str, labels: list[str], embedded=None,
+                            title: str = None, uploaded_at: datetime = None):
+    if embedded is None:
+        embedded = embed_documents([content])[0]
+    chunks, embeddings = embedded
+
+    _add_records(list(_chunk_records(document_id, summary, labels, chunks, embeddings, title, uploaded_at)))
+    bump_collection_version()
+    print(f"Saved {len(chunks)} chunk embeddings for document {document_id}")
+
+def save_document_embeddings(documents: list[dict]):
+    """Store the chunks of many documents with as few vector store add calls as possible.
+
+    Each item needs document_id, summary, labels and embedded (from embed_documents);
+    title and uploaded_at are optional and make the chunks filterable.
+    """
+    records = []
+    for doc in documents:
+        chunks, embeddings = doc["embedded"]
+        records += _chunk_records(doc["document_id"], doc["summary"], doc["labels"], chunks, embeddings,
+                                  doc.get("title"), doc.get("uploaded_at"))
+    if records:
+        _add_records(records)
+        bump_collection_version()
+        print(f"Saved {len(records)} chunk embeddings for {len(documents)} documents")
+
+def _snippet(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= SEARCH_SNIPPET_CHARS else text[:SEARCH_SNIPPET_CHARS].rsplit(" ", 1)[0] + "…"
+
+def semantic_search(query: str, top_k=3, offset=0, filters: dict = None, after: tuple = None, snippets=False):
+    """Query chunks and aggregate the hits back to documents, ordered by (score, document_id).
+
+    ``filters`` (see chroma_where) are applied inside the vector store, before ranking.
+    With ``after`` (an order_key from a cursor) the page starts after that
+    result; ``offset`` is then the number of results already returned.
+    ``snippets`` replaces summary, labels and chunk offsets with the text of
+    the best matching chunks.
+    """
+    query_embedding = embed_query(query)
+    needed = offset + top_k
+    n_results = needed * CHUNK_SEARCH_OVERSAMPLE
+    while True:
+        results = get_store().query(
+            query_embeddings=query_embedding[None, :],
+            n_results=n_results,
+            where=chroma_where(filters),
+            include=["metadatas", "distances", "documents"]
+        )
+        hits = results["metadatas"][0]
+        # A few long documents can fill the whole fetch; widen it until enough distinct
+        # documents came back or the (filtered) collection ran out
+        if len({metadata["document_id"] for metadata in hits}) >= needed or len(hits) < n_results:
+            break
+        n_results *= 2
+
+    documents = {}
+    for metadata, distance, text in zip(results["metadatas"][0], results["distances"][0], results["documents"][0]):
+        similarity = _similarity(distance)
+        doc = documents.get(metadata["document_id"])
+        if doc is None:
+            # Hits arrive best first, so the first chunk already holds the max score
+            doc = documents[metadata["document_id"]] = {
+                "document_id": metadata["document_id"],
+                "score": similarity
+            }
+            if snippets:
+                doc["snippets"] = []
+            else:
+                doc.update(summary=metadata["summary"], labels=metadata["labels"], chunks=[])
+        elif CHUNK_SCORE_AGGREGATION == "sum":
+            doc["score"] += similarity
+        if not snippets:
+            doc["chunks"].append({
+                "chunk_index": metadata.get("chunk_index", 0),
+                "start": metadata.get("start", 0),
+                "end": metadata.get("end"),
+                "score": similarity
+            })
+        elif len(doc["snippets"]) < SEARCH_SNIPPETS_PER_DOCUMENT:
+            doc["snippets"].append({
+                "chunk_index": metadata.get("chunk_index", 0),
+                "page": metadata.get("page"),
+                "score": similarity,
+                "text": _snippet(text)
+            })
+
+    ranked = sorted(documents.values(), key=lambda d: order_key(d["score"], d["document_id"]))
+    if after is not None:
+        return page_after(ranked, after, top_k, key=lambda d: order_key(d["score"], d["document_id"]))[0]
+    return ranked[offset:offset + top_k]
@@ -0,0 +1,135 @@
+import os
+import logging
+import numpy as np
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "paraphrase-multilingual-MiniLM-L12-v2")
+# "torch" (SentenceTransformer) or "onnx" (ONNX Runtime, exported on first use)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/onnx")
+# Dynamic int8 quantization of the exported weights
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "0") == "1"
+# ONNX Runtime intra-op threads, 0 lets it pick
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+class TorchEncoder:
+    """The SentenceTransformer model in plain PyTorch."""
+
+    name = "torch"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: list[str], batch_size: int = 32, normalize: bool = True) -> np.ndarray:
+        return self.model.encode(
+            texts, batch_size=batch_size, normalize_embeddings=normalize, convert_to_numpy=True
+        ).astype(np.float32)
+
+
+class OnnxEncoder:
+    """The same transformer exported to ONNX, with sentence-transformers' mean pooling in NumPy."""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, model_dir: str = ONNX_MODEL_DIR,
+                 quantize: bool = ONNX_QUANTIZE, threads: int = ONNX_THREADS):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        path, self.max_length = export_onnx(model_name, model_dir, quantize)
+        self.name = "onnx-int8" if quantize else "onnx"
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def encode(self, texts: list[str], batch_size: int = 32, normalize: bool = True) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Length-sorted batches pad less
+        order = np.argsort([len(t) for t in texts])
+        out = [None] * len(texts)
+        for i in range(0, len(texts), batch_size):
+            idx = order[i:i + batch_size]
+            tokens = self.tokenizer(
+                [texts[j] for j in idx], padding=True, truncation=True,
+                max_length=self.max_length, return_tensors="np"
+            )
+            mask = tokens["attention_mask"].astype(np.int64)
+            hidden = self.session.run(None, {
+                "input_ids": tokens["input_ids"].astype(np.int64),
+                "attention_mask": mask
+            })[0]
+            weights = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+            for j, vector in zip(idx, pooled):
+                out[j] = vector
+        embeddings = np.vstack(out).astype(np.float32)
+        return _normalize(embeddings) if normalize else embeddings
+
+
+def export_onnx(model_name: str, model_dir: str, quantize: bool):
+    """Export the transformer to model_dir once (and its int8 variant); returns (path, max_length)."""
+    fp32_path = os.path.join(model_dir, "model.onnx")
+    int8_path = os.path.join(model_dir, "model.int8.onnx")
+    length_path = os.path.join(model_dir, "max_seq_length")
+
+    if not os.path.exists(fp32_path):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        logging.info(f"Exporting {model_name} to ONNX in {model_dir}...")
+        os.makedirs(model_dir, exist_ok=True)
+        st_model = SentenceTransformer(model_name, device="cpu")
+        st_model.tokenizer.save_pretrained(model_dir)
+        with open(length_path, "w") as f:
+            f.write(str(st_model.max_seq_length))
+
+        class LastHiddenState(torch.nn.Module):
+            def __init__(self, transformer):
+                super().__init__()
+                self.transformer = transformer
+
+            def forward(self, input_ids, attention_mask):
+                return self.transformer(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+        dummy = st_model.tokenizer(["örnek belge metni"], return_tensors="pt")
+        torch.onnx.export(
+            LastHiddenState(st_model[0].auto_model).eval(),
+            (dummy["input_ids"], dummy["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"}
+            },
+            opset_version=14
+        )
+
+    if quantize and not os.path.exists(int8_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        logging.info(f"Quantizing {fp32_path} to int8...")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    with open(length_path) as f:
+        max_length = int(f.read())
+    return (int8_path if quantize else fp32_path), max_length
+
+
+def get_encoder(backend: str = EMBEDDING_BACKEND):
+    if backend == "torch":
+        return TorchEncoder()
+    if backend == "onnx":
+        return OnnxEncoder()
+    if backend == "onnx-int8":
+        return OnnxEncoder(quantize=True)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
@@ -0,0 +1,131 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from services.embedding_utils import semantic_search
+from services.search_cursor import order_key, page_after
+from services import search_cache
+from database.operations import lexical_search_documents, lexical_search_labels, get_document_summaries
+
+# Reciprocal rank fusion constant; larger values flatten the advantage of top ranks
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+# A stage that has not answered by then is left out of the fusion
+HYBRID_STAGE_TIMEOUT = float(os.getenv("HYBRID_STAGE_TIMEOUT", "5"))
+# Hits taken from every stage whatever page is asked for: RRF scores depend on
+# the ranking depth, so a page-dependent depth would reorder results between pages.
+# Hybrid results end at this many documents.
+HYBRID_STAGE_DEPTH = int(os.getenv("HYBRID_STAGE_DEPTH", "200"))
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("HYBRID_SEARCH_THREADS", "12")),
+                               thread_name_prefix="search")
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def _vector_ranking(query: str, depth: int, filters: dict):
+    # Documents with their matched chunks; reduced to ids before fusion
+    return semantic_search(query, top_k=depth, filters=filters, snippets=True)
+
+def _lexical_ranking(search_fn):
+    def ranking(query: str, depth: int, filters: dict):
+        return [row.document_id for row in search_fn(query, depth, filters)]
+    return ranking
+
+STAGES = {
+    "vector": _vector_ranking,
+    "lexical_documents": _lexical_ranking(lexical_search_documents),
+    "lexical_labels": _lexical_ranking(lexical_search_labels),
+}
+
+def reciprocal_rank_fusion(rankings: dict, k=HYBRID_RRF_K):
+    """Fuse ranked id lists into [(id, score, {stage: rank})], best first; ties keep id order."""
+    scores = {}
+    ranks = {}
+    for stage, ids in rankings.items():
+        for rank, document_id in enumerate(ids, start=1):
+            scores[document_id] = scores.get(document_id, 0.0) + 1.0 / (k + rank)
+            ranks.setdefault(document_id, {})[stage] = rank
+    fused = sorted(scores, key=lambda d: (-scores[d], d))
+    return [(d, scores[d], ranks[d]) for d in fused]
+
+def fused_ranking(query: str, filters: dict = None):
+    """((fused, matched chunks per document, failed stages, stage timings), from_cache) of one query.
+
+    Every stage is read HYBRID_STAGE_DEPTH deep, and the result is cached
+    per query and filters until the collection changes, so all pages of a
+    query are slices of the same list, even when a stage timed out.
+    """
+    key = search_cache.result_key(mode="hybrid-fused", query=query, filters=filters)
+    cached = search_cache.fused_ranking_cache.get(key)
+    if cached is not None:
+        return cached, True
+
+    futures = {
+        stage: _executor.submit(_timed, fn, query, HYBRID_STAGE_DEPTH, filters) for stage, fn in STAGES.items()
+    }
+    deadline = time.perf_counter() + HYBRID_STAGE_TIMEOUT
+    rankings = {}
+    timings = {}
+    failed = []
+    for stage, future in futures.items():
+        try:
+            rankings[stage], seconds = future.result(timeout=max(0.0, deadline - time.perf_counter()))
+            timings[stage] = round(1000 * seconds, 2)
+        except Exception as e:
+            logging.warning(f"Search stage {stage} failed or timed out: {e!r}")
+            rankings[stage] = []
+            failed.append(stage)
+    matched_chunks = {doc["document_id"]: doc["snippets"] for doc in rankings["vector"]}
+    rankings["vector"] = [doc["document_id"] for doc in rankings["vector"]]
+
+    start = time.perf_counter()
+    fused = reciprocal_rank_fusion(rankings)
+    timings["fusion"] = round(1000 * (time.perf_counter() - start), 2)
+    ranking = (fused, matched_chunks, failed, timings)
+    search_cache.fused_ranking_cache.set(key, ranking)
+    return ranking, False
+
+def hybrid_search(query: str, top_k=10, offset=0, filters: dict = None, after: tuple = None, snippets=False):
+    """Vector and Postgres full-text rankings queried in parallel and fused with RRF.
+
+    ``filters`` are applied inside every stage (Chroma where clause, SQL
+    conditions). Pages are slices of fused_ranking. ``after`` and
+    ``snippets`` work as in semantic_search; documents only found by the
+    full-text stages have no snippets.
+    """
+    total_start = time.perf_counter()
+    (fused, matched_chunks, failed, stage_timings), from_cache = fused_ranking(query, filters)
+    # Stage timings of a cached ranking are those of the request that computed it
+    timings = {**stage_timings, "ranking_cached": from_cache}
+    if after is not None:
+        page, has_more = page_after(fused, after, top_k, key=lambda item: order_key(item[1], item[0]))
+    else:
+        page, has_more = fused[offset:offset + top_k], len(fused) > offset + top_k
+
+    start = time.perf_counter()
+    documents = get_document_summaries([document_id for document_id, _, _ in page])
+    timings["hydrate"] = round(1000 * (time.perf_counter() - start), 2)
+
+    results = []
+    for document_id, score, ranks in page:
+        doc = documents.get(document_id)
+        if doc is None:
+            continue  # in the vector store but already deleted from Postgres
+        result = {"document_id": document_id, "title": doc["title"], "score": score, "ranks": ranks}
+        if snippets:
+            result["snippets"] = matched_chunks.get(document_id, [])
+        else:
+            result.update(summary=doc["summary"], labels=doc["labels"])
+        results.append(result)
+
+    timings["total"] = round(1000 * (time.perf_counter() - total_start), 2)
+    return {
+        "results": results,
+        "offset": offset,
+        "top_k": top_k,
+        "has_more": has_more,
+        "failed_stages": failed,
+        "timings_ms": timings
+    }
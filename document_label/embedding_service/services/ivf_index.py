@@ -0,0 +1,105 @@
+import os
+import numpy as np
+
+# Rows assigned per matrix product while (re)building lists
+IVF_ASSIGN_BLOCK = int(os.getenv("IVF_ASSIGN_BLOCK", "65536"))
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def assign_lists(vectors, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (highest inner product) of every row, computed block by block."""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), IVF_ASSIGN_BLOCK):
+        block = np.asarray(vectors[start:start + IVF_ASSIGN_BLOCK], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+def kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means: unit-length centroids, rows assigned by cosine similarity."""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_lists(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        empty = np.bincount(assignments, minlength=n_clusters) == 0
+        centroids = _unit(sums)
+        # Re-seed clusters that lost all their rows
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index: rows grouped under their nearest k-means centroid.
+
+    A query scores only the rows in the ``nprobe`` lists whose centroids
+    are closest to it; more lists probed means higher recall and more work.
+    ``trained_rows`` is the row count the centroids were trained at.
+    """
+
+    def __init__(self, centroids: np.ndarray, trained_rows: int):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.trained_rows = trained_rows
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self._lists = [np.zeros(0, dtype=np.int64) for _ in range(len(self.centroids))]
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def add(self, start_row: int, vectors, assignments: np.ndarray = None) -> np.ndarray:
+        """File rows start_row.. under their lists; returns their list numbers."""
+        if assignments is None:
+            assignments = assign_lists(vectors, self.centroids)
+        rows = np.arange(start_row, start_row + len(assignments), dtype=np.int64)
+        self.assignments = np.concatenate([self.assignments[:start_row], assignments])
+        order = np.argsort(assignments, kind="stable")
+        lists, starts = np.unique(assignments[order], return_index=True)
+        for lst, group in zip(lists, np.split(rows[order], starts[1:])):
+            self._lists[lst] = np.concatenate([self._lists[lst], group])
+        return assignments
+
+    def probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Candidate rows for one unit query vector."""
+        nprobe = min(nprobe, self.n_lists)
+        closest = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self._lists[lst] for lst in closest])
+
+    def remap(self, live_rows: np.ndarray) -> "IVFIndex":
+        """The same lists after compaction renumbered ``live_rows`` to 0..n-1."""
+        index = IVFIndex(self.centroids, self.trained_rows)
+        index.add(0, None, assignments=self.assignments[live_rows])
+        return index
+
+    def list_sizes(self) -> np.ndarray:
+        return np.array([len(rows) for rows in self._lists])
+
+    # --- Files ---
+    def save(self, centroids_path: str, assignments_path: str):
+        np.save(centroids_path, self.centroids)
+        self.assignments.astype(np.int32).tofile(assignments_path)
+
+    def append_assignments(self, assignments_path: str, assignments: np.ndarray):
+        with open(assignments_path, "ab") as f:
+            f.write(assignments.astype(np.int32).tobytes())
+
+    @classmethod
+    def load(cls, centroids_path: str, assignments_path: str, trained_rows: int, rows: int, matrix):
+        """Rebuild the lists from disk; rows missing from the assignments file are assigned again."""
+        index = cls(np.load(centroids_path), trained_rows)
+        stored = np.fromfile(assignments_path, dtype=np.int32)
+        assignments = stored[:rows]
+        if len(stored) != rows:
+            # Crash between writes: drop uncommitted rows, assign the missing ones
+            missing = assign_lists(matrix[len(assignments):rows], index.centroids)
+            assignments = np.concatenate([assignments, missing])
+            index.assignments = assignments
+            index.save(centroids_path, assignments_path)
+        index.add(0, None, assignments=assignments)
+        return index
@@ -0,0 +1,94 @@
+import os
+import time
+import logging
+import threading
+
+# Load every registered resource in a background thread right after startup
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
+
+_PROCESS_START = time.time()
+_resources = {}
+
+
+class LazyResource:
+    """Thread-safe holder that builds its value on first use and records how long that took.
+
+    A failed load is remembered for health reporting and retried on the
+    next ``get()``. Unregistered resources are left out of warm-up and health.
+    """
+
+    def __init__(self, name: str, factory, required: bool = True, register: bool = True):
+        self.name = name
+        self.factory = factory
+        self.required = required
+        self.load_seconds = None
+        self.loaded_at = None
+        self.error = None
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        if register:
+            _resources[name] = self
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                start = time.perf_counter()
+                try:
+                    value = self.factory()
+                except Exception as e:
+                    self.error = repr(e)
+                    logging.error(f"Failed to load {self.name}: {e}")
+                    raise
+                self._value = value
+                self.load_seconds = round(time.perf_counter() - start, 3)
+                self.loaded_at = time.time()
+                self.error = None
+                self._loaded = True
+                logging.info(f"Loaded {self.name} in {self.load_seconds:.2f}s")
+        return self._value
+
+    def status(self):
+        return {
+            "loaded": self._loaded,
+            "required": self.required,
+            "load_seconds": self.load_seconds,
+            "ready_after_start_seconds": round(self.loaded_at - _PROCESS_START, 3) if self.loaded_at else None,
+            "error": self.error
+        }
+
+
+def warm_up(background: bool = True):
+    """Load all registered resources now instead of on the first request."""
+    def run():
+        for resource in list(_resources.values()):
+            try:
+                resource.get()
+            except Exception:
+                pass  # already logged, and retried on first use
+
+    if background:
+        threading.Thread(target=run, name="warm-up", daemon=True).start()
+    else:
+        run()
+
+def is_ready() -> bool:
+    """Ready once every required resource is loaded (or, without warm-up, none has failed)."""
+    required = [r for r in _resources.values() if r.required]
+    if any(r.error for r in required):
+        return False
+    return all(r.loaded for r in required) if WARMUP_ON_STARTUP else True
+
+def startup_report():
+    return {
+        "uptime_seconds": round(time.time() - _PROCESS_START, 3),
+        "warm_up": WARMUP_ON_STARTUP,
+        "ready": is_ready(),
+        "components": {name: r.status() for name, r in _resources.items()}
+    }
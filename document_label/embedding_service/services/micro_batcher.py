@@ -0,0 +1,144 @@
+import os
+import time
+import queue
+import collections
+import logging
+import threading
+from concurrent.futures import Future
+import numpy as np
+
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "1") == "1"
+# How long the first request of a batch waits for company
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "5"))
+# Stop collecting once this many texts are queued
+MICROBATCH_MAX_BATCH = int(os.getenv("MICROBATCH_MAX_BATCH", "64"))
+
+
+class MicroBatcher:
+    """Coalesces concurrent encode requests into one forward pass on a dedicated thread.
+
+    Callers get a Future per request; the encoder thread waits up to
+    ``max_wait_ms`` after the first request for others to arrive, encodes
+    everything collected in a single call and resolves each Future with
+    its own rows. A request larger than ``max_batch`` is encoded in
+    ``max_batch`` slices taken in turn with the other queued requests, so
+    a bulk insert delays a search query by at most one forward pass.
+    """
+
+    def __init__(self, encode_fn, max_batch: int = MICROBATCH_MAX_BATCH, max_wait_ms: float = MICROBATCH_MAX_WAIT_MS):
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        # [texts, future, next text to encode, encoded slices] of requests being worked on, in turn order
+        self._active = collections.deque()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "texts": 0, "batches": 0, "largest_batch": 0, "split_requests": 0}
+        self._thread = threading.Thread(target=self._run, name="encoder", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: list[str]) -> Future:
+        future = Future()
+        if not texts:
+            future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return future
+        self._queue.put((list(texts), future))
+        return future
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """Blocking encode; call from worker threads (sync FastAPI endpoints run in one)."""
+        return self.submit(texts).result()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["avg_batch_texts"] = stats["texts"] / stats["batches"] if stats["batches"] else 0.0
+        stats["max_batch"] = self.max_batch
+        stats["max_wait_ms"] = self.max_wait * 1000
+        return stats
+
+    def _admit(self, item, arrived: list):
+        texts, future = item
+        if future.set_running_or_notify_cancel():
+            arrived.append([texts, future, 0, []])
+            return len(texts)
+        return 0
+
+    def _collect(self):
+        """Move queued requests to the active ones; waits only when nothing is in progress."""
+        arrived = []
+        if self._active:
+            # Slices of a large request are pending: take whatever arrived, without
+            # waiting, and serve it before the next slice
+            while True:
+                try:
+                    self._admit(self._queue.get_nowait(), arrived)
+                except queue.Empty:
+                    break
+            self._active.extendleft(reversed(arrived))
+            return
+        count = self._admit(self._queue.get(), arrived)
+        deadline = time.monotonic() + self.max_wait
+        while count < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            count += self._admit(item, arrived)
+        self._active.extend(arrived)
+
+    def _next_batch(self):
+        """[(request, start, end)] of up to max_batch texts, one slice per request in turn order."""
+        batch = []
+        count = 0
+        for _ in range(len(self._active)):
+            if count >= self.max_batch:
+                break
+            request = self._active.popleft()
+            texts, _, start, _ = request
+            end = min(len(texts), start + self.max_batch - count)
+            batch.append((request, start, end))
+            count += end - start
+            request[2] = end
+            if end < len(texts):
+                # Unfinished requests go to the back so the ones behind them get the next batch
+                self._active.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            self._collect()
+            batch = self._next_batch()
+            if not batch:
+                continue
+            texts = [text for request, start, end in batch for text in request[0][start:end]]
+            try:
+                embeddings = self.encode_fn(texts)
+            except Exception as e:
+                logging.exception("Batched encode failed")
+                for request, _, _ in batch:
+                    if not request[1].done():
+                        request[1].set_exception(e)
+                # The rest of a failed request is not worth encoding
+                self._active = collections.deque(r for r in self._active if not r[1].done())
+                continue
+
+            pos = 0
+            finished = []
+            for request, start, end in batch:
+                request_texts, future, _, parts = request
+                parts.append(embeddings[pos:pos + end - start])
+                pos += end - start
+                if end == len(request_texts):
+                    future.set_result(parts[0] if len(parts) == 1 else np.concatenate(parts))
+                    finished.append(len(parts))
+
+            with self._stats_lock:
+                self._stats["requests"] += len(finished)
+                self._stats["split_requests"] += sum(parts > 1 for parts in finished)
+                self._stats["texts"] += len(texts)
+                self._stats["batches"] += 1
+                self._stats["largest_batch"] = max(self._stats["largest_batch"], len(texts))
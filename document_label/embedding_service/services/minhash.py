@@ -0,0 +1,61 @@
+import os
+import zlib
+import hashlib
+import numpy as np
+
+MINHASH_NUM_PERM = int(os.getenv("MINHASH_NUM_PERM", "128"))
+# bands * rows must equal num_perm; 16 x 8 puts the LSH candidate threshold near Jaccard 0.7
+MINHASH_BANDS = int(os.getenv("MINHASH_BANDS", "16"))
+# Character shingles survive the single-letter OCR errors that break word shingles
+MINHASH_SHINGLE_SIZE = int(os.getenv("MINHASH_SHINGLE_SIZE", "5"))
+
+_rng = np.random.RandomState(20240601)
+# Multiply-shift hashing: h(x) = ((a * x + b) mod 2^64) >> 32, with odd a
+_A = (_rng.randint(0, 2 ** 32, size=MINHASH_NUM_PERM, dtype=np.uint64) << np.uint64(32)) \
+    | _rng.randint(0, 2 ** 32, size=MINHASH_NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = (_rng.randint(0, 2 ** 32, size=MINHASH_NUM_PERM, dtype=np.uint64) << np.uint64(32)) \
+    | _rng.randint(0, 2 ** 32, size=MINHASH_NUM_PERM, dtype=np.uint64)
+_SHIFT = np.uint64(32)
+_BLOCK = 4096
+
+def normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+def shingles(text: str, size=MINHASH_SHINGLE_SIZE):
+    text = normalize(text)
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+def signature(text: str) -> np.ndarray:
+    """MinHash signature (uint32, MINHASH_NUM_PERM values) of the text's character shingles."""
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles(text)),
+        dtype=np.uint64
+    )
+    sig = np.full(MINHASH_NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    # Blocked to keep the (shingles x permutations) matrix small; uint64 overflow is the mod 2^64
+    with np.errstate(over="ignore"):
+        for i in range(0, len(hashes), _BLOCK):
+            block = hashes[i:i + _BLOCK, None]
+            np.minimum(sig, ((block * _A + _B) >> _SHIFT).min(axis=0), out=sig)
+    return sig.astype(np.uint32)
+
+def band_buckets(sig: np.ndarray, bands=MINHASH_BANDS):
+    """LSH (band, bucket) keys; documents sharing any key are near-duplicate candidates."""
+    rows = len(sig) // bands
+    keys = []
+    for band in range(bands):
+        digest = hashlib.blake2b(sig[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest()
+        keys.append((band, int.from_bytes(digest, "little", signed=True)))
+    return keys
+
+def jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the underlying shingle sets."""
+    return float(np.mean(sig_a == sig_b))
+
+def to_bytes(sig: np.ndarray) -> bytes:
+    return sig.astype("<u4").tobytes()
+
+def from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4").astype(np.uint32)
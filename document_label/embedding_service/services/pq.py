@@ -0,0 +1,81 @@
+import os
+import numpy as np
+
+# Rows encoded or scored per step
+PQ_BLOCK = int(os.getenv("PQ_BLOCK", "65536"))
+PQ_CENTROIDS = 256  # one byte per sub-vector code
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid by Euclidean distance: argmax of x.c - |c|^2 / 2."""
+    return np.argmax(vectors @ centroids.T - 0.5 * np.sum(centroids ** 2, axis=1), axis=1)
+
+def _kmeans_l2(vectors: np.ndarray, k: int, iterations: int, rng) -> np.ndarray:
+    centroids = vectors[rng.choice(len(vectors), k, replace=len(vectors) < k)].copy()
+    for _ in range(iterations):
+        assignments = _nearest(vectors, centroids)
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+def subspaces_for(dim: int, wanted: int) -> int:
+    """Largest sub-vector count up to ``wanted`` that divides ``dim``."""
+    return max(m for m in range(1, min(wanted, dim) + 1) if dim % m == 0)
+
+
+class ProductQuantizer:
+    """Each vector split into ``m`` sub-vectors, each stored as the byte id of its nearest codebook entry.
+
+    Inner products with a query are approximated from per-query lookup
+    tables, so scoring reads m bytes per vector instead of 4 * dim.
+    """
+
+    def __init__(self, codebooks: np.ndarray):
+        # m x 256 x (dim / m)
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)
+
+    @property
+    def m(self) -> int:
+        return self.codebooks.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.codebooks.shape[0] * self.codebooks.shape[2]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codebooks.nbytes
+
+    @classmethod
+    def train(cls, vectors, m: int, iterations: int = 10, seed: int = 0) -> "ProductQuantizer":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        m = subspaces_for(vectors.shape[1], m)
+        rng = np.random.default_rng(seed)
+        subvectors = vectors.reshape(len(vectors), m, -1)
+        return cls(np.stack([
+            _kmeans_l2(np.ascontiguousarray(subvectors[:, j]), PQ_CENTROIDS, iterations, rng) for j in range(m)
+        ]))
+
+    def encode(self, vectors) -> np.ndarray:
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for start in range(0, len(vectors), PQ_BLOCK):
+            block = np.asarray(vectors[start:start + PQ_BLOCK], dtype=np.float32).reshape(-1, self.m, self.dim // self.m)
+            for j in range(self.m):
+                codes[start:start + len(block), j] = _nearest(block[:, j], self.codebooks[j])
+        return codes
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """rows x queries approximate inner products."""
+        # queries x m x 256: each query sub-vector against every codebook entry
+        tables = np.einsum("jcd,qjd->qjc", self.codebooks, queries.reshape(len(queries), self.m, -1))
+        tables = tables.reshape(len(queries), -1)
+        offsets = np.arange(self.m) * PQ_CENTROIDS
+        scores = np.empty((len(codes), len(queries)), dtype=np.float32)
+        for start in range(0, len(codes), PQ_BLOCK):
+            flat = codes[start:start + PQ_BLOCK].astype(np.intp) + offsets
+            for i, table in enumerate(tables):
+                scores[start:start + len(flat), i] = table[flat].sum(axis=1)
+        return scores
@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "86400"))
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "1024"))
+# Bounds staleness when another replica adds documents
+SEARCH_RESULT_CACHE_TTL = float(os.getenv("SEARCH_RESULT_CACHE_TTL", "300"))
+# Fused hybrid rankings, so the pages of one query are cut from one list
+FUSED_RANKING_CACHE_SIZE = int(os.getenv("FUSED_RANKING_CACHE_SIZE", "256"))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+query_embedding_cache = TTLCache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL)
+search_result_cache = TTLCache(SEARCH_RESULT_CACHE_SIZE, SEARCH_RESULT_CACHE_TTL)
+fused_ranking_cache = TTLCache(FUSED_RANKING_CACHE_SIZE, SEARCH_RESULT_CACHE_TTL)
+
+_collection_version = 0
+_version_lock = threading.Lock()
+
+def collection_version() -> int:
+    return _collection_version
+
+def bump_collection_version():
+    """Called whenever documents are added; cached search results become unreachable."""
+    global _collection_version
+    with _version_lock:
+        _collection_version += 1
+    search_result_cache.clear()
+    fused_ranking_cache.clear()
+
+def normalize_query(query: str) -> str:
+    """Cache-key form of a query: whitespace collapsed, case kept (the encoder is case-sensitive)."""
+    return " ".join(query.split())
+
+def result_key(**params) -> str:
+    """Cache key for a search: its parameters (query normalized) plus the collection version."""
+    params["query"] = normalize_query(params["query"])
+    params["version"] = collection_version()
+    return json.dumps(params, sort_keys=True, default=str)
+
+def stats():
+    return {
+        "collection_version": collection_version(),
+        "query_embeddings": query_embedding_cache.stats(),
+        "search_results": search_result_cache.stats(),
+        "fused_rankings": fused_ranking_cache.stats()
+    }
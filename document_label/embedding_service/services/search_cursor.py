@@ -0,0 +1,39 @@
+import json
+import base64
+import hashlib
+from services.search_cache import normalize_query
+
+
+class InvalidCursor(ValueError):
+    """The cursor is malformed or was issued for a different search."""
+
+
+def order_key(score: float, document_id):
+    """Results are ordered by score, best first; ties by document id, so every page boundary is exact."""
+    return (-score, document_id)
+
+def fingerprint(mode: str, query: str, filters: dict) -> str:
+    """Identifies the search a cursor belongs to: mode, normalized query and filters."""
+    search = json.dumps([mode, normalize_query(query), filters], sort_keys=True, default=str)
+    return hashlib.sha256(search.encode("utf-8")).hexdigest()[:16]
+
+def encode(search: str, position: int, last: dict) -> str:
+    """Opaque cursor for the page after ``last``, the final result of a page ending at ``position``."""
+    payload = {"f": search, "p": position, "s": last["score"], "d": last["document_id"]}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode(cursor: str, search: str):
+    """(position, order key of the last result returned) of a cursor from ``encode``."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        owner, position, key = payload["f"], int(payload["p"]), order_key(float(payload["s"]), payload["d"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Malformed cursor: {e}") from e
+    if owner != search:
+        raise InvalidCursor("Cursor belongs to a different query, mode or filter set")
+    return position, key
+
+def page_after(ranked: list, after, top_k: int, key) -> tuple:
+    """(page, has_more): the ``top_k`` items of ``ranked`` that order after the key ``after``."""
+    remaining = [item for item in ranked if key(item) > after]
+    return remaining[:top_k], len(remaining) > top_k
@@ -0,0 +1,743 @@
+import os
+import json
+import time
+import logging
+import threading
+import numpy as np
+from services.ivf_index import IVFIndex, kmeans
+from services.pq import ProductQuantizer
+
+# "chroma" (Chroma over HTTP) or "numpy" (in-process, memory-mapped)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "vectors")
+# float16 halves memory and disk, but a full scan is several times slower: NumPy
+# upcasts every block to float32 before the matrix product
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+# Rows scored per step; bounds the float32 copy made of a float16 block
+VECTOR_SCAN_BLOCK = int(os.getenv("VECTOR_SCAN_BLOCK", "65536"))
+# Rewrite the files once this share of the rows has been deleted
+VECTOR_COMPACT_RATIO = float(os.getenv("VECTOR_COMPACT_RATIO", "0.3"))
+# "flat" scans every row; "ivf" probes the nearest k-means lists once enough rows exist
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "flat")
+# Lists in the IVF index; 0 picks 4 * sqrt(rows) at training time
+IVF_LISTS = int(os.getenv("IVF_LISTS", "0"))
+# Lists probed per query: the recall/latency knob
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+# Below this many vectors exact search is fast enough and the index is not trained
+IVF_MIN_ROWS = int(os.getenv("IVF_MIN_ROWS", "50000"))
+# Rows sampled to train the centroids
+IVF_TRAIN_SAMPLE = int(os.getenv("IVF_TRAIN_SAMPLE", "65536"))
+# Retrain once the store has grown this many times past the rows the centroids were trained on
+IVF_RETRAIN_GROWTH = float(os.getenv("IVF_RETRAIN_GROWTH", "4"))
+# What queries scan: "none" the stored matrix itself, "float16" a half-precision copy in RAM,
+# "pq" product-quantized codes; the last two re-rank their best candidates against the matrix.
+# Both trade scan speed for resident memory (see benchmark_ann.py); with VECTOR_INDEX=ivf
+# only the probed lists are scored, which keeps that cost small
+VECTOR_COMPRESSION = os.getenv("VECTOR_COMPRESSION", "none")
+# Candidates re-ranked at full precision per requested result
+VECTOR_RERANK = int(os.getenv("VECTOR_RERANK", "4"))
+# PQ bytes per vector (sub-vectors), rounded down to a divisor of the dimension
+PQ_M = int(os.getenv("PQ_M", "48"))
+# PQ codebooks are trained once this many vectors exist; until then the matrix is scanned
+PQ_MIN_ROWS = int(os.getenv("PQ_MIN_ROWS", "10000"))
+
+ALL_FIELDS = ("metadatas", "documents", "distances")
+
+
+class VectorStore:
+    """Chunk vectors with their text and metadata, behind Chroma's collection API.
+
+    ``query`` returns {"ids", plus the ``include``d "distances", "metadatas"
+    and "documents"}, each holding one list per query embedding. ``space``
+    names the distance those are in ("cosine": 1 - cos).
+    """
+
+    name = None
+    space = "cosine"
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def add(self, ids: list[str], embeddings, documents: list[str], metadatas: list[dict]):
+        raise NotImplementedError
+
+    def query(self, query_embeddings, n_results: int, where: dict = None, include=ALL_FIELDS) -> dict:
+        raise NotImplementedError
+
+    def delete(self, ids: list[str] = None, where: dict = None):
+        raise NotImplementedError
+
+    def clear(self) -> int:
+        """Remove every vector; returns how many there were."""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "count": self.count()}
+
+
+class ChromaVectorStore(VectorStore):
+    """The Chroma server's "documents" collection."""
+
+    name = "chroma"
+
+    def __init__(self, host: str = "chromadb", port: int = 8000, collection: str = "documents"):
+        import chromadb
+        client = chromadb.HttpClient(host=host, port=port)
+        # New collections use cosine distance; older L2 collections keep theirs
+        self.collection = client.get_or_create_collection(collection, metadata={"hnsw:space": "cosine"})
+        self.space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+
+    def count(self):
+        return self.collection.count()
+
+    # Chroma's HTTP API takes JSON lists; everything upstream stays NumPy
+    def add(self, ids, embeddings, documents, metadatas):
+        self.collection.add(ids=ids, embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
+                            documents=documents, metadatas=metadatas)
+
+    def query(self, query_embeddings, n_results, where=None, include=ALL_FIELDS):
+        return self.collection.query(
+            query_embeddings=np.asarray(query_embeddings, dtype=np.float32).tolist(),
+            n_results=n_results, where=where, include=list(include)
+        )
+
+    def delete(self, ids=None, where=None):
+        self.collection.delete(ids=ids, where=where)
+
+    def clear(self):
+        ids = self.collection.get(include=[])["ids"]
+        for i in range(0, len(ids), 1000):
+            self.collection.delete(ids=ids[i:i + 1000])
+        return len(ids)
+
+
+# --- Where clauses ---
+_OPERATORS = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$gt": lambda value, operand: value > operand,
+    "$gte": lambda value, operand: value >= operand,
+    "$lt": lambda value, operand: value < operand,
+    "$lte": lambda value, operand: value <= operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+}
+
+def matches(metadata: dict, where: dict) -> bool:
+    """Evaluate a Chroma where clause against one metadata dict.
+
+    As in Chroma, a condition on a key the metadata lacks never matches.
+    """
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, clause) for clause in condition):
+                return False
+        elif key not in metadata:
+            return False
+        elif isinstance(condition, dict):
+            for operator, operand in condition.items():
+                if operator not in _OPERATORS:
+                    raise ValueError(f"Unsupported where operator: {operator}")
+                if not _OPERATORS[operator](metadata[key], operand):
+                    return False
+        elif metadata[key] != condition:
+            return False
+    return True
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def _scores(matrix, queries: np.ndarray) -> np.ndarray:
+    """rows x queries cosine similarities, in float32 whatever the storage dtype."""
+    scores = np.empty((len(matrix), len(queries)), dtype=np.float32)
+    for start in range(0, len(matrix), VECTOR_SCAN_BLOCK):
+        block = np.asarray(matrix[start:start + VECTOR_SCAN_BLOCK], dtype=np.float32)
+        scores[start:start + len(block)] = block @ queries.T
+    return scores
+
+def _grow(array, capacity: int):
+    if array is None or len(array) >= capacity:
+        return array
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class _ScanView:
+    """The arrays one query reads, captured together under the store's lock."""
+
+    def __init__(self, store: "NumpyVectorStore"):
+        self.rows = store.rows
+        self.matrix = store._matrix
+        # Rows below self.rows keep their ids until a compaction, which swaps in new lists
+        self.ids = store._ids
+        self.index = store.index
+        self.pq = self.codes = self.half = None
+        if store.compression == "pq" and store.pq is not None:
+            self.pq, self.codes = store.pq, store._codes
+        elif store.compression == "float16" and store._half is not None:
+            self.half = store._half
+        # Approximate scores are re-ranked against the matrix
+        self.approximate = self.pq is not None or self.half is not None
+
+    def scores(self, queries: np.ndarray, candidates: np.ndarray = None) -> np.ndarray:
+        if self.pq is not None:
+            codes = self.codes[:self.rows] if candidates is None else self.codes[candidates]
+            return self.pq.scores(codes, queries)
+        source = self.half if self.half is not None else self.matrix
+        return _scores(source[:self.rows] if candidates is None else source[candidates], queries)
+
+
+class NumpyVectorStore(VectorStore):
+    """In-process exact search over a memory-mapped matrix of unit vectors.
+
+    One matrix-vector product per query scores every row, and
+    ``argpartition`` picks the top k without sorting the rest. Files in
+    ``directory``, per generation g:
+
+    - vectors.<g>.bin: capacity x dim matrix in ``dtype``, grown by doubling
+    - records.<g>.jsonl: append-only log of added rows and deleted ids
+    - state.json: generation, dim, dtype and committed row count, replaced last
+      on every write, so rows past its count (a crash mid-add) are ignored.
+
+    Deletes are tombstones until VECTOR_COMPACT_RATIO of the rows are dead;
+    compaction then writes generation g + 1 and switches state.json to it.
+
+    With VECTOR_INDEX=ivf an IVF index (ivf.<g>.<v>.centroids.npy and
+    .assign) is trained in the background once IVF_MIN_ROWS vectors exist,
+    and retrained as the store grows. New rows are filed under their list
+    on insert; until the index is ready, queries scan every row.
+
+    VECTOR_COMPRESSION picks what the scan reads: the matrix, a float16 copy
+    held in RAM, or PQ codes (pq.<g>.<v>.codebooks.npy and .codes, trained
+    like the IVF index once PQ_MIN_ROWS vectors exist). The compressed scans
+    keep VECTOR_RERANK * k candidates and re-score them against the matrix,
+    of which only those rows are read. They save memory, not time: scoring
+    float16 rows or PQ codes costs more per row than a float32 product.
+    """
+
+    name = "numpy"
+
+    def __init__(self, directory: str = VECTOR_STORE_DIR, dtype: str = VECTOR_DTYPE,
+                 compression: str = VECTOR_COMPRESSION):
+        if compression not in ("none", "float16", "pq"):
+            raise ValueError(f"Unknown VECTOR_COMPRESSION: {compression}")
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.compression = compression
+        self.generation = 0
+        self._reset()
+        self._lock = threading.RLock()
+        self.nprobe = IVF_NPROBE
+        self._training = False
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+        if self.compression == "float16" and self._matrix is not None:
+            self._half = self._half_copy()
+        self._maybe_train()
+
+    def _reset(self):
+        """Empty in-memory state; the generation is kept so a running training notices."""
+        self.dim = None
+        self.rows = 0
+        self._matrix = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids = []
+        self._documents = []
+        self._metadatas = []
+        self._row_of = {}
+        self._mask_cache = {}
+        self.index = None
+        self.index_version = 0
+        self.pq = None
+        self._codes = None
+        self._half = None
+
+    # --- Files ---
+    def _path(self, name: str, generation: int = None, version: int = None) -> str:
+        generation = self.generation if generation is None else generation
+        version = self.index_version if version is None else version
+        return os.path.join(self.directory, name.format(g=generation, v=version))
+
+    def _index_paths(self, generation: int = None, version: int = None):
+        return (self._path("ivf.{g}.{v}.centroids.npy", generation, version),
+                self._path("ivf.{g}.{v}.assign", generation, version))
+
+    def _pq_paths(self, generation: int = None, version: int = None):
+        return (self._path("pq.{g}.{v}.codebooks.npy", generation, version),
+                self._path("pq.{g}.{v}.codes", generation, version))
+
+    def _save_trained(self, generation: int = None):
+        """Write the IVF index and PQ codes, whichever exist, under the current version."""
+        if self.index is not None:
+            self.index.save(*self._index_paths(generation))
+        if self.pq is not None:
+            codebooks_path, codes_path = self._pq_paths(generation)
+            np.save(codebooks_path, self.pq.codebooks)
+            self._codes[:self.rows].tofile(codes_path)
+
+    def _remove_trained_files(self, generation: int, version: int):
+        for path in self._index_paths(generation, version) + self._pq_paths(generation, version):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _write_state(self):
+        state_path = os.path.join(self.directory, "state.json")
+        with open(state_path + ".tmp", "w") as f:
+            json.dump({
+                "generation": self.generation, "dim": self.dim, "dtype": self.dtype.name, "rows": self.rows,
+                "index_version": self.index_version,
+                "index_trained_rows": self.index.trained_rows if self.index is not None else None,
+                "pq": self.pq is not None
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(state_path + ".tmp", state_path)
+
+    def _open_matrix(self, capacity: int, mode: str):
+        return np.memmap(self._path("vectors.{g}.bin"), dtype=self.dtype, mode=mode, shape=(capacity, self.dim))
+
+    def _load(self):
+        state_path = os.path.join(self.directory, "state.json")
+        if not os.path.exists(state_path):
+            return
+        with open(state_path) as f:
+            state = json.load(f)
+        self.generation, self.dim, self.rows = state["generation"], state["dim"], state["rows"]
+        stored_dtype = np.dtype(state["dtype"])
+
+        with open(self._path("records.{g}.jsonl"), "rb+") as f:
+            valid_end = 0
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn last line from a crash
+                if "delete" in record:
+                    row = self._row_of.pop(record["delete"], None)
+                    if row is not None:
+                        self._documents[row] = self._metadatas[row] = None
+                elif record["row"] < self.rows:
+                    self._ids.append(record["id"])
+                    self._documents.append(record["document"])
+                    self._metadatas.append(record["metadata"])
+                    self._row_of[record["id"]] = record["row"]
+                else:
+                    break  # logged by an add that crashed before committing
+                valid_end += len(line)
+            # Drop the uncommitted tail so the next add can reuse its row numbers
+            f.truncate(valid_end)
+
+        capacity = os.path.getsize(self._path("vectors.{g}.bin")) // (self.dim * stored_dtype.itemsize)
+        self._matrix = np.memmap(self._path("vectors.{g}.bin"), dtype=stored_dtype, mode="r+",
+                                 shape=(capacity, self.dim))
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._alive[list(self._row_of.values())] = True
+        self.index_version = state.get("index_version", 0)
+        if state.get("index_trained_rows") is not None:
+            self.index = IVFIndex.load(*self._index_paths(), state["index_trained_rows"], self.rows, self._matrix)
+        if state.get("pq"):
+            self._load_pq()
+        logging.info(f"Loaded {len(self._row_of)} vectors ({stored_dtype.name}) from {self.directory}")
+        if stored_dtype != self.dtype:
+            # VECTOR_DTYPE changed: rewrite the matrix in the new precision
+            self._compact()
+
+    def _load_pq(self):
+        codebooks_path, codes_path = self._pq_paths()
+        self.pq = ProductQuantizer(np.load(codebooks_path))
+        codes = np.fromfile(codes_path, dtype=np.uint8).reshape(-1, self.pq.m)
+        if len(codes) != self.rows:
+            # Crash between writes: drop uncommitted rows, encode the missing ones
+            codes = np.concatenate([codes[:self.rows], self.pq.encode(self._matrix[len(codes):self.rows])])
+            codes.tofile(codes_path)
+        self._codes = _grow(codes, len(self._matrix))
+
+    def _half_copy(self) -> np.ndarray:
+        half = np.zeros((len(self._matrix), self.dim), dtype=np.float16)
+        for start in range(0, self.rows, VECTOR_SCAN_BLOCK):
+            stop = min(start + VECTOR_SCAN_BLOCK, self.rows)
+            half[start:stop] = self._matrix[start:stop]
+        return half
+
+    def _ensure_capacity(self, extra: int):
+        needed = self.rows + extra
+        if self._matrix is None:
+            capacity = max(1024, needed)
+            self._matrix = self._open_matrix(capacity, "w+")
+            open(self._path("records.{g}.jsonl"), "a").close()
+        elif needed > len(self._matrix):
+            capacity = max(2 * len(self._matrix), needed)
+            self._matrix.flush()
+            # Growing the file keeps existing rows in place; readers holding the old map stay valid
+            with open(self._path("vectors.{g}.bin"), "r+b") as f:
+                f.truncate(capacity * self.dim * self.dtype.itemsize)
+            self._matrix = self._open_matrix(capacity, "r+")
+        else:
+            return
+        self._alive = _grow(self._alive, len(self._matrix))
+        self._codes = _grow(self._codes, len(self._matrix))
+        if self.compression == "float16":
+            self._half = _grow(self._half, len(self._matrix)) if self._half is not None \
+                else np.zeros((len(self._matrix), self.dim), dtype=np.float16)
+
+    def _compact(self):
+        """Write the live rows into the next generation and switch to it."""
+        live = np.flatnonzero(self._alive[:self.rows])
+        generation = self.generation + 1
+        capacity = max(1024, len(live))
+        matrix = np.memmap(self._path("vectors.{g}.bin", generation), dtype=self.dtype, mode="w+",
+                           shape=(capacity, self.dim))
+        for start in range(0, len(live), VECTOR_SCAN_BLOCK):
+            block = live[start:start + VECTOR_SCAN_BLOCK]
+            matrix[start:start + len(block)] = self._matrix[block]
+        matrix.flush()
+        with open(self._path("records.{g}.jsonl", generation), "w", encoding="utf-8") as f:
+            for new_row, row in enumerate(live):
+                f.write(json.dumps({"row": new_row, "id": self._ids[row], "document": self._documents[row],
+                                    "metadata": self._metadatas[row]}, ensure_ascii=False) + "\n")
+
+        old_generation = self.generation
+        self._ids = [self._ids[row] for row in live]
+        self._documents = [self._documents[row] for row in live]
+        self._metadatas = [self._metadatas[row] for row in live]
+        self._row_of = {id_: row for row, id_ in enumerate(self._ids)}
+        self._matrix = matrix
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._alive[:len(live)] = True
+        if self.index is not None:
+            self.index = self.index.remap(live)
+        if self._codes is not None:
+            self._codes = _grow(self._codes[live], capacity)
+        self.rows = len(live)
+        self._save_trained(generation)
+        self.generation = generation
+        if self._half is not None:
+            self._half = self._half_copy()
+        self._mask_cache.clear()
+        self._write_state()
+        for name in ("vectors.{g}.bin", "records.{g}.jsonl"):
+            os.remove(self._path(name, old_generation))
+        self._remove_trained_files(old_generation, self.index_version)
+        logging.info(f"Compacted vector store to {self.rows} rows (generation {generation})")
+
+    # --- Writes ---
+    def count(self):
+        return len(self._row_of)
+
+    def add(self, ids, embeddings, documents, metadatas):
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store's {self.dim}")
+
+            # Like Chroma's add, ids that already exist are left untouched
+            seen = set()
+            keep = []
+            for i, id_ in enumerate(ids):
+                if id_ not in self._row_of and id_ not in seen:
+                    seen.add(id_)
+                    keep.append(i)
+            if not keep:
+                return
+
+            start = self.rows
+            self._ensure_capacity(len(keep))
+            self._matrix[start:start + len(keep)] = vectors[keep]
+            self._matrix.flush()
+            with open(self._path("records.{g}.jsonl"), "a", encoding="utf-8") as f:
+                for row, i in enumerate(keep, start):
+                    f.write(json.dumps({"row": row, "id": ids[i], "document": documents[i],
+                                        "metadata": metadatas[i]}, ensure_ascii=False) + "\n")
+            for row, i in enumerate(keep, start):
+                self._ids.append(ids[i])
+                self._documents.append(documents[i])
+                self._metadatas.append(metadatas[i])
+                self._row_of[ids[i]] = row
+            self._alive[start:start + len(keep)] = True
+            if self._half is not None:
+                self._half[start:start + len(keep)] = vectors[keep]
+            if self.index is not None:
+                assignments = self.index.add(start, vectors[keep])
+                self.index.append_assignments(self._index_paths()[1], assignments)
+            if self.pq is not None:
+                codes = self.pq.encode(vectors[keep])
+                self._codes[start:start + len(keep)] = codes
+                with open(self._pq_paths()[1], "ab") as f:
+                    f.write(codes.tobytes())
+            self.rows += len(keep)
+            self._mask_cache.clear()
+            self._write_state()
+        self._maybe_train()
+
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            rows = {self._row_of[id_] for id_ in ids or [] if id_ in self._row_of}
+            if where:
+                rows.update(int(row) for row in np.flatnonzero(self._where_mask(where)))
+            if not rows:
+                return
+            with open(self._path("records.{g}.jsonl"), "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({"delete": self._ids[row]}, ensure_ascii=False) + "\n")
+            for row in rows:
+                del self._row_of[self._ids[row]]
+                self._documents[row] = self._metadatas[row] = None
+                self._alive[row] = False
+            self._mask_cache.clear()
+            if self.rows - self.count() >= VECTOR_COMPACT_RATIO * self.rows:
+                self._compact()
+
+    def clear(self):
+        with self._lock:
+            count = self.count()
+            self._matrix = None  # drop the memmap before its file goes
+            for name in os.listdir(self.directory):
+                if name == "state.json" or name.split(".")[0] in ("vectors", "records", "ivf", "pq"):
+                    os.remove(os.path.join(self.directory, name))
+            # A later generation: files of a training still running are never picked up
+            self.generation += 1
+            self._reset()
+        logging.info(f"Cleared {count} vectors from {self.directory}")
+        return count
+
+    # --- IVF index and PQ codebooks ---
+    def _maybe_train(self):
+        if self._training or not self.rows:
+            return
+        ivf_due = VECTOR_INDEX == "ivf" and (
+            self.count() >= IVF_MIN_ROWS if self.index is None
+            else self.count() >= IVF_RETRAIN_GROWTH * self.index.trained_rows
+        )
+        pq_due = self.compression == "pq" and self.pq is None and self.count() >= PQ_MIN_ROWS
+        if ivf_due or pq_due:
+            self.build_index(background=True, ivf=ivf_due)
+
+    def build_index(self, n_lists: int = None, background: bool = False, ivf: bool = True):
+        """Train IVF centroids (and PQ codebooks, when PQ is on and untrained) on a sample of the live rows.
+
+        Every row is filed and encoded before the new version is switched in;
+        queries keep using the previous one (or a full scan) until then.
+        """
+        with self._lock:
+            if self._training:
+                return
+            self._training = True
+        if background:
+            threading.Thread(target=self._train, args=(n_lists, ivf), name="index-train", daemon=True).start()
+        else:
+            self._train(n_lists, ivf)
+
+    def _train(self, n_lists: int = None, ivf: bool = True):
+        try:
+            train_pq = self.compression == "pq" and self.pq is None
+            with self._lock:
+                rows, generation, matrix = self.rows, self.generation, self._matrix
+                live = np.flatnonzero(self._alive[:rows])
+            if len(live) == 0 or not (ivf or train_pq):
+                return
+            start = time.perf_counter()
+            rng = np.random.default_rng(0)
+            sample = matrix[np.sort(rng.choice(live, min(IVF_TRAIN_SAMPLE, len(live)), replace=False))]
+            index = quantizer = codes = None
+            if ivf:
+                n_lists = n_lists or IVF_LISTS or int(np.clip(4 * np.sqrt(len(live)), 16, 65536))
+                index = IVFIndex(kmeans(sample, n_lists), trained_rows=len(live))
+                index.add(0, matrix[:rows])
+            if train_pq:
+                quantizer = ProductQuantizer.train(sample, PQ_M)
+                codes = quantizer.encode(matrix[:rows])
+
+            with self._lock:
+                if self.generation != generation:
+                    return  # compacted meanwhile; the next add retrains
+                if self.rows > rows:
+                    if index is not None:
+                        index.add(rows, self._matrix[rows:self.rows])
+                    if quantizer is not None:
+                        codes = np.concatenate([codes, quantizer.encode(self._matrix[rows:self.rows])])
+                if index is not None:
+                    self.index = index
+                if quantizer is not None:
+                    self.pq, self._codes = quantizer, _grow(codes, len(self._matrix))
+                old_version = self.index_version
+                self.index_version += 1
+                self._save_trained()
+                self._write_state()
+                self._remove_trained_files(self.generation, old_version)
+            logging.info(
+                f"Trained {'IVF (' + str(index.n_lists) + ' lists)' if index else ''}"
+                f"{' and ' if index and quantizer else ''}{'PQ (' + str(quantizer.m) + ' bytes)' if quantizer else ''}"
+                f" over {len(live)} vectors in {time.perf_counter() - start:.1f}s"
+            )
+        except Exception:
+            logging.exception("Vector index training failed")
+        finally:
+            self._training = False
+
+    def set_compression(self, compression: str):
+        """Switch what queries scan; a float16 copy is made and PQ trained right away if needed."""
+        with self._lock:
+            self.compression = compression
+            self._half = self._half_copy() if compression == "float16" and self._matrix is not None else None
+        if compression == "pq" and self.pq is None:
+            self.build_index(ivf=False)
+
+    # --- Search ---
+    def _where_mask(self, where: dict) -> np.ndarray:
+        """Rows whose metadata matches ``where``; cached until the next write."""
+        key = json.dumps(where, sort_keys=True, default=str)
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (metadata is not None and matches(metadata, where) for metadata in self._metadatas),
+                dtype=bool, count=self.rows
+            )
+            self._mask_cache[key] = mask
+        return mask
+
+    def query(self, query_embeddings, n_results, where=None, include=ALL_FIELDS):
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1))
+        with self._lock:
+            view = _ScanView(self)
+            mask = self._alive[:view.rows].copy()
+            if where:
+                mask &= self._where_mask(where)
+        candidates = np.flatnonzero(mask)
+
+        if len(candidates) == 0:
+            hits = [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))] * len(queries)
+        elif len(candidates) < view.rows // 4:
+            # Selective filter: gather and score only the matching rows
+            hits = self._search(view, queries, n_results, candidates=candidates)
+        elif view.index is not None:
+            hits = [self._search(view, query[None, :], n_results, candidates=self._probe(view, mask, query))[0]
+                    for query in queries]
+        else:
+            hits = self._search(view, queries, n_results, mask=mask)
+        return self._results(view, hits, include)
+
+    def _probe(self, view: _ScanView, mask: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Rows of the nprobe IVF lists closest to one query that pass ``mask``."""
+        candidates = view.index.probe(query, self.nprobe)
+        # Rows added after the snapshot was taken are left for the next query
+        candidates = candidates[candidates < view.rows]
+        return np.sort(candidates[mask[candidates]])
+
+    def _search(self, view: _ScanView, queries: np.ndarray, k: int, candidates=None, mask=None):
+        """Top k (rows, scores) per query among ``candidates``, or among all rows ``mask`` allows."""
+        fetch = k * VECTOR_RERANK if view.approximate else k
+        scores = view.scores(queries, candidates)
+        if candidates is None:
+            scores[~mask] = -np.inf
+            fetch = min(fetch, int(mask.sum()))
+        hits = self._top_k(scores, fetch)
+        if candidates is not None:
+            hits = [(candidates[best], best_scores) for best, best_scores in hits]
+        if view.approximate:
+            hits = [self._rerank(view.matrix, rows, query, k) for (rows, _), query in zip(hits, queries)]
+        return hits
+
+    @staticmethod
+    def _rerank(matrix, rows: np.ndarray, query: np.ndarray, k: int):
+        """Exact scores of the approximate candidates, read from the stored matrix."""
+        rows = np.sort(rows)  # ascending rows read the memmap front to back
+        scores = np.asarray(matrix[rows], dtype=np.float32) @ query
+        best = np.argsort(-scores, kind="stable")[:k]
+        return rows[best], scores[best]
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int):
+        """Per query column, (row indices, scores) of the k best rows, best first."""
+        k = min(k, len(scores))
+        hits = []
+        for column in scores.T:
+            if k <= 0:
+                best = np.zeros(0, dtype=np.int64)
+            elif k < len(column):
+                best = np.argpartition(-column, k - 1)[:k]
+            else:
+                best = np.arange(len(column))
+            best = best[np.argsort(-column[best], kind="stable")]
+            hits.append((best, column[best]))
+        return hits
+
+    def _results(self, view: _ScanView, hits: list, include) -> dict:
+        results = {"ids": []}
+        for field in include:
+            results[field] = []
+        with self._lock:
+            for rows, scores in hits:
+                # Rows are numbered as in the view; a compaction since then renumbered the
+                # live rows, so records are looked up by id. Ids deleted meanwhile are dropped.
+                kept = []
+                for row, score in zip(rows, scores):
+                    id_ = view.ids[row]
+                    current = self._row_of.get(id_)
+                    if current is not None:
+                        kept.append((id_, current, float(score)))
+                results["ids"].append([id_ for id_, _, _ in kept])
+                if "distances" in results:
+                    results["distances"].append([1 - score for _, _, score in kept])
+                if "metadatas" in results:
+                    results["metadatas"].append([self._metadatas[row] for _, row, _ in kept])
+                if "documents" in results:
+                    results["documents"].append([self._documents[row] for _, row, _ in kept])
+        return results
+
+    def memory(self) -> dict:
+        """Bytes the scan keeps resident, per vector and per stored document."""
+        rows = self.rows
+        matrix_bytes = rows * (self.dim or 0) * self.dtype.itemsize
+        if self.compression == "pq" and self.pq is not None:
+            scan, resident = "pq", rows * self.pq.m + self.pq.nbytes
+        elif self.compression == "float16" and self._half is not None:
+            scan, resident = "float16", rows * self.dim * 2
+        else:
+            scan, resident = self.dtype.name, matrix_bytes
+        if self.index is not None:
+            # Row ids in the lists plus the assignment per row
+            resident += rows * 12 + self.index.centroids.nbytes
+        documents = len({m["document_id"] for m in self._metadatas if m and "document_id" in m})
+        return {
+            "scan": scan,
+            "resident_bytes": resident,
+            "bytes_per_vector": round(resident / rows, 1) if rows else None,
+            "documents": documents,
+            "bytes_per_document": round(resident / documents, 1) if documents else None,
+            # Only the re-ranked rows of the matrix are read from disk when the scan is compressed
+            "matrix_bytes": matrix_bytes
+        }
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "count": self.count(),
+            "rows": self.rows,
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "compression": self.compression,
+            "memory": self.memory(),
+            "index": {
+                "type": "ivf",
+                "lists": self.index.n_lists,
+                "nprobe": self.nprobe,
+                "trained_rows": self.index.trained_rows,
+                "largest_list": int(self.index.list_sizes().max())
+            } if self.index is not None else {"type": "flat", "training": self._training}
+        }
+
+
+def get_vector_store(backend: str = VECTOR_BACKEND) -> VectorStore:
+    if backend == "chroma":
+        return ChromaVectorStore()
+    if backend == "numpy":
+        return NumpyVectorStore()
+    raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
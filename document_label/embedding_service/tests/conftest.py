@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Services are imported as top-level packages (services.*, database.*), as in the container
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,44 @@
+from services.chunking import chunk_document
+
+
+def sentence(n, words=10):
+    return " ".join(f"s{n}w{i}" for i in range(words - 1)) + f" s{n}end."
+
+
+def word_count(chunk):
+    return len(chunk["text"].split())
+
+
+def test_short_text_is_one_chunk():
+    text = "  Kısa bir belge.  "
+    assert chunk_document(text) == [{"text": "Kısa bir belge.", "start": 2, "end": 17, "page": 0}]
+
+
+def test_chunks_are_whole_sentences_within_the_word_limit():
+    text = " ".join(sentence(n) for n in range(20))
+    chunks = chunk_document(text, max_words=35, overlap_words=10)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert text[chunk["start"]:chunk["end"]] == chunk["text"]
+        assert word_count(chunk) <= 35
+        assert chunk["text"].startswith("s") and chunk["text"].endswith("end.")
+    # Every sentence is covered; consecutive chunks overlap by up to overlap_words of whole sentences
+    assert chunks[0]["start"] == 0 and chunks[-1]["end"] == len(text)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk["start"] < previous["end"]
+        assert len(text[chunk["start"]:previous["end"]].split()) <= 10
+
+
+def test_chunks_never_cross_a_page_break():
+    pages = [" ".join(sentence(n) for n in range(p * 10, p * 10 + 3)) for p in range(3)]
+    text = "\f".join(pages[:2]) + "\n\n\n\n" + pages[2]
+    chunks = chunk_document(text, max_words=100, overlap_words=10)
+    assert [chunk["page"] for chunk in chunks] == [0, 1, 2]
+    assert [chunk["text"] for chunk in chunks] == pages
+
+
+def test_overlong_sentence_is_cut_on_word_boundaries():
+    text = " ".join(f"w{i}" for i in range(25)) + "."
+    chunks = chunk_document(text, max_words=10, overlap_words=0)
+    assert [word_count(chunk) for chunk in chunks] == [10, 10, 5]
+    assert " ".join(chunk["text"] for chunk in chunks) == text
@@ -0,0 +1,83 @@
+from datetime import datetime
+from types import SimpleNamespace
+import numpy as np
+import pytest
+import main
+from services import embedding_utils
+from services.vector_store import NumpyVectorStore
+
+
+class FailingStore(NumpyVectorStore):
+    """Fails the second add call, as when Chroma goes away in the middle of a batch."""
+
+    def __init__(self, directory):
+        super().__init__(directory, compression="none")
+        self.adds = 0
+
+    def add(self, ids, embeddings, documents, metadatas):
+        self.adds += 1
+        if self.adds == 2:
+            raise ConnectionError("vector store unavailable")
+        super().add(ids, embeddings, documents, metadatas)
+
+
+@pytest.fixture
+def confirm(monkeypatch, tmp_path):
+    """Fake Postgres and dedup around a vector store whose second add fails."""
+    rows = {}
+    store = FailingStore(str(tmp_path))
+
+    def screen(contents):
+        rng = np.random.default_rng(len(contents))
+        screened = [{
+            "duplicate": False, "layer": None, "match": None, "similarity": None,
+            "content_hash": f"hash {i}", "minhash": None,
+            "embedded": ([{"text": content, "start": 0, "end": len(content), "page": 0}] * 2,
+                         rng.normal(size=(2, 8)).astype(np.float32))
+        } for i, content in enumerate(contents)]
+        return screened, {}
+
+    def create_document(**fields):
+        document_id = len(rows) + 1
+        rows[document_id] = fields
+        return SimpleNamespace(document_id=document_id, title=fields["title"], uploaded_at=datetime(2024, 1, 1))
+
+    def delete_documents(document_ids):
+        for document_id in document_ids:
+            del rows[document_id]
+
+    monkeypatch.setattr(main, "screen", screen)
+    monkeypatch.setattr(main, "create_document", create_document)
+    monkeypatch.setattr(main, "delete_documents", delete_documents)
+    monkeypatch.setattr(main, "blob_store", SimpleNamespace(put_bytes=lambda data: ("blob", len(data), False)))
+    monkeypatch.setattr(embedding_utils, "get_store", lambda: store)
+    monkeypatch.setattr(embedding_utils, "CHROMA_ADD_BATCH", 2)
+    return rows, store
+
+
+def document(n):
+    return main.ConfirmInput(title=f"doc {n}", content=f"content {n}", summary="", labels=["kira"],
+                             file_bytes=b"%PDF")
+
+
+def test_failed_vector_write_leaves_no_document_behind(confirm):
+    rows, store = confirm
+    with pytest.raises(ConnectionError):
+        main.confirm_documents(main.ConfirmBatchInput(documents=[document(n) for n in range(3)]))
+    # The chunks of the first add call are removed too, so a retry starts clean
+    assert rows == {}
+    assert store.count() == 0
+
+    store.adds = -10
+    response = main.confirm_documents(main.ConfirmBatchInput(documents=[document(n) for n in range(3)]))
+    assert response["saved"] == 3
+    assert store.count() == 6 and len(rows) == 3
+
+
+def test_single_confirm_removes_its_row_when_the_vectors_fail(confirm):
+    rows, store = confirm
+    store.adds = 1
+    with pytest.raises(ConnectionError):
+        main.confirm_document(document(0))
+    assert rows == {}
+    assert store.count() == 0
@@ -0,0 +1,32 @@
+import numpy as np
+from services.vector_store import NumpyVectorStore
+
+
+def unit_rows(n, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_ivf_recall_against_flat(tmp_path):
+    # Clustered data, like document embeddings
+    rng = np.random.default_rng(0)
+    centers = unit_rows(40, dim=32, seed=1)
+    vectors = centers[rng.integers(0, 40, size=4000)] + 0.15 * rng.normal(size=(4000, 32)).astype(np.float32)
+    ids = [f"doc{i}" for i in range(len(vectors))]
+    metadatas = [{"document_id": i} for i in range(len(vectors))]
+    flat = NumpyVectorStore(str(tmp_path / "flat"), compression="none")
+    flat.add(ids, vectors, ids, metadatas)
+    ivf = NumpyVectorStore(str(tmp_path / "ivf"), compression="none")
+    ivf.add(ids, vectors, ids, metadatas)
+    ivf.build_index(n_lists=64)
+    ivf.nprobe = 8
+    assert ivf.index is not None
+
+    queries = vectors[rng.choice(len(vectors), 50, replace=False)] + 0.05 * rng.normal(size=(50, 32))
+    expected = flat.query(queries, n_results=10)["ids"]
+    found = ivf.query(queries, n_results=10)["ids"]
+    recall = np.mean([len(set(e) & set(f)) / 10 for e, f in zip(expected, found)])
+    assert recall >= 0.9
+    # Probing every list is an exact search
+    ivf.nprobe = 64
+    assert ivf.query(queries, n_results=10)["ids"] == expected
@@ -0,0 +1,28 @@
+import threading
+import numpy as np
+from services.micro_batcher import MicroBatcher
+
+
+def test_small_request_is_not_stuck_behind_a_large_one():
+    batches = []
+    first_batch_started = threading.Event()
+    release = threading.Event()
+
+    def encode(texts):
+        batches.append(list(texts))
+        first_batch_started.set()
+        release.wait(5)
+        return np.array([[float(text.split("-")[1])] for text in texts], dtype=np.float32)
+
+    batcher = MicroBatcher(encode, max_batch=4, max_wait_ms=1)
+    large = batcher.submit([f"bulk-{i}" for i in range(10)])
+    assert first_batch_started.wait(5)
+    small = batcher.submit(["query-100", "query-101"])
+    release.set()
+
+    assert small.result(5).ravel().tolist() == [100.0, 101.0]
+    assert large.result(5).ravel().tolist() == list(range(10))
+    assert all(len(batch) <= 4 for batch in batches)
+    # One slice of the large request, then the small one with the next slice
+    assert batches[1][:2] == ["query-100", "query-101"]
+    assert batcher.stats()["split_requests"] == 1
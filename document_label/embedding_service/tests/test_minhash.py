@@ -0,0 +1,45 @@
+import numpy as np
+from services import minhash
+
+
+def exact_jaccard(a, b):
+    a, b = minhash.shingles(a), minhash.shingles(b)
+    return len(a & b) / len(a | b)
+
+
+BASE = ("Kiracı, kira bedelini her ayın beşinci gününe kadar kiraya verenin banka hesabına "
+        "yatırmakla yükümlüdür. Sözleşme bir yıl süreyle yapılmış olup taraflarca feshedilmedikçe "
+        "aynı şartlarla uzar. Depozito bedeli sözleşme sonunda iade edilir.")
+
+
+def test_identical_text_up_to_case_and_whitespace():
+    variant = "  " + BASE.replace("Depozito bedeli", "DEPOZITO\n  bedeli") + "\n"
+    assert minhash.jaccard(minhash.signature(BASE), minhash.signature(variant)) == 1.0
+
+
+def test_estimate_tracks_the_exact_jaccard():
+    rng = np.random.default_rng(0)
+    words = BASE.split()
+    for replaced in (2, 6, 12, 20):
+        edited = list(words)
+        for i in rng.choice(len(words), replaced, replace=False):
+            edited[i] = "değiştirildi"
+        edited = " ".join(edited)
+        estimate = minhash.jaccard(minhash.signature(BASE), minhash.signature(edited))
+        # Standard error of a 128-permutation estimate is at most 0.045
+        assert abs(estimate - exact_jaccard(BASE, edited)) < 0.15
+
+
+def test_unrelated_texts_are_not_lsh_candidates():
+    other = "Fatura tutarı KDV dahil 12.500 TL olup ödeme vadesi otuz gündür."
+    sig_a, sig_b = minhash.signature(BASE), minhash.signature(other)
+    assert minhash.jaccard(sig_a, sig_b) < 0.1
+    assert not set(minhash.band_buckets(sig_a)) & set(minhash.band_buckets(sig_b))
+    near = minhash.signature(BASE.replace("beşinci", "onuncu"))
+    assert set(minhash.band_buckets(sig_a)) & set(minhash.band_buckets(near))
+
+
+def test_signature_bytes_round_trip():
+    sig = minhash.signature(BASE)
+    assert sig.dtype == np.uint32 and len(sig) == minhash.MINHASH_NUM_PERM
+    np.testing.assert_array_equal(minhash.from_bytes(minhash.to_bytes(sig)), sig)
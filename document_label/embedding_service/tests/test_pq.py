@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from services.pq import ProductQuantizer, subspaces_for
+from services.vector_store import NumpyVectorStore
+
+
+def unit_rows(n, dim=32, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def decode(quantizer, codes):
+    return np.concatenate([quantizer.codebooks[j][codes[:, j]] for j in range(quantizer.m)], axis=1)
+
+
+@pytest.fixture(scope="module")
+def trained():
+    vectors = unit_rows(3000)
+    return ProductQuantizer.train(vectors, m=8), vectors
+
+
+def test_subspaces_divide_the_dimension():
+    assert subspaces_for(384, 48) == 48
+    assert subspaces_for(384, 50) == 48
+    assert subspaces_for(30, 8) == 6
+
+
+def test_encode_decode_error(trained):
+    quantizer, vectors = trained
+    codes = quantizer.encode(vectors)
+    assert codes.shape == (3000, 8) and codes.dtype == np.uint8
+    error = np.linalg.norm(decode(quantizer, codes) - vectors, axis=1)
+    # Unit vectors; 256 centroids per 4-dimensional sub-vector
+    assert error.mean() < 0.5
+    # Every sub-vector takes its nearest centroid, so no other code is closer
+    other = codes.copy()
+    other[:, 0] = (other[:, 0].astype(np.int64) + 1) % 256
+    assert np.all(np.linalg.norm(decode(quantizer, other) - vectors, axis=1) >= error - 1e-6)
+
+
+def test_scores_are_inner_products_with_the_decoded_vectors(trained):
+    quantizer, vectors = trained
+    codes = quantizer.encode(vectors[:200])
+    queries = unit_rows(3, seed=1)
+    np.testing.assert_allclose(quantizer.scores(codes, queries), decode(quantizer, codes) @ queries.T,
+                               rtol=1e-4, atol=1e-5)
+
+
+def test_pq_store_reranks_to_the_exact_neighbour(tmp_path):
+    vectors = unit_rows(2000)
+    ids = [f"doc{i}" for i in range(len(vectors))]
+    store = NumpyVectorStore(str(tmp_path), compression="none")
+    store.add(ids, vectors, ids, [{"document_id": i} for i in range(len(vectors))])
+    store.set_compression("pq")
+    assert store.pq is not None
+    result = store.query(vectors[[5, 500, 1500]], n_results=1)
+    assert result["ids"] == [["doc5"], ["doc500"], ["doc1500"]]
@@ -0,0 +1,64 @@
+import base64
+import json
+import pytest
+from services import search_cursor
+from services.search_cursor import InvalidCursor
+
+FILTERS = {"labels": ["fatura"], "title": None}
+
+
+def edit(cursor, **changes):
+    payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    payload.update(changes)
+    for key in [k for k, v in changes.items() if v is None]:
+        del payload[key]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+@pytest.fixture
+def search():
+    return search_cursor.fingerprint("hybrid", "kira sözleşmesi", FILTERS)
+
+
+def test_encode_decode_round_trip(search):
+    cursor = search_cursor.encode(search, 20, {"document_id": 42, "score": 0.031})
+    assert "=" not in cursor
+    assert search_cursor.decode(cursor, search) == (20, search_cursor.order_key(0.031, 42))
+
+
+def test_fingerprint_ignores_whitespace_only(search):
+    assert search_cursor.fingerprint("hybrid", "  kira   sözleşmesi ", FILTERS) == search
+    assert search_cursor.fingerprint("hybrid", "Kira sözleşmesi", FILTERS) != search
+    assert search_cursor.fingerprint("vector", "kira sözleşmesi", FILTERS) != search
+    assert search_cursor.fingerprint("hybrid", "kira sözleşmesi", {**FILTERS, "title": "x"}) != search
+
+
+def test_cursor_of_another_search_is_rejected(search):
+    other = search_cursor.fingerprint("hybrid", "fatura", FILTERS)
+    cursor = search_cursor.encode(other, 10, {"document_id": 1, "score": 0.5})
+    with pytest.raises(InvalidCursor, match="different query"):
+        search_cursor.decode(cursor, search)
+
+
+@pytest.mark.parametrize("tamper", [
+    lambda cursor: cursor[:-3],
+    lambda cursor: base64.urlsafe_b64encode(b"not json").decode("ascii"),
+    lambda cursor: edit(cursor, f="0" * 16),
+    lambda cursor: edit(cursor, f=None),
+    lambda cursor: edit(cursor, p="ten"),
+    lambda cursor: edit(cursor, s=None),
+    lambda cursor: base64.urlsafe_b64encode(b"[1, 2]").decode("ascii"),
+])
+def test_tampered_cursor_is_rejected(search, tamper):
+    cursor = search_cursor.encode(search, 10, {"document_id": 7, "score": 0.25})
+    with pytest.raises(InvalidCursor):
+        search_cursor.decode(tamper(cursor), search)
+
+
+def test_page_after_resumes_past_ties():
+    ranked = [(1, 0.9), (2, 0.5), (3, 0.5), (4, 0.5), (5, 0.1)]
+    key = lambda item: search_cursor.order_key(item[1], item[0])
+    page, has_more = search_cursor.page_after(ranked, key((2, 0.5)), 2, key)
+    assert page == [(3, 0.5), (4, 0.5)] and has_more
+    page, has_more = search_cursor.page_after(ranked, key((4, 0.5)), 2, key)
+    assert page == [(5, 0.1)] and not has_more
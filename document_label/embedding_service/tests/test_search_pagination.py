@@ -0,0 +1,116 @@
+import json
+import numpy as np
+import pytest
+import main
+from services import embedding_utils, hybrid_search, search_cache
+from services.vector_store import NumpyVectorStore
+
+VECTOR = [3, 1, 5, 2, 6, 7, 4, 8, 10, 9, 11]
+LEXICAL = [5, 3, 2, 1, 7, 6, 8, 4, 9, 11, 10]
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """Fixed stage rankings, truncated to the depth each call asks for."""
+    calls = []
+
+    def vector(query, depth, filters):
+        calls.append(depth)
+        return [{"document_id": d, "snippets": [{"text": f"chunk of {d}"}]} for d in VECTOR[:depth]]
+
+    def lexical(query, depth, filters):
+        return LEXICAL[:depth]
+
+    monkeypatch.setattr(hybrid_search, "STAGES", {"vector": vector, "lexical_documents": lexical})
+    monkeypatch.setattr(hybrid_search, "get_document_summaries", lambda ids: {
+        d: {"title": f"doc {d}", "summary": "", "labels": []} for d in ids
+    })
+    search_cache.bump_collection_version()
+    return calls
+
+
+def full_ranking():
+    fused = hybrid_search.reciprocal_rank_fusion({"vector": VECTOR, "lexical_documents": LEXICAL})
+    return [document_id for document_id, _, _ in fused]
+
+
+def walk(data, page_size):
+    pages, cursor = [], None
+    while True:
+        page = main.search_page(data, page_size, cursor)
+        pages.append([result["document_id"] for result in page["results"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 4, 11, 20])
+def test_cursor_pages_cover_the_full_ranking_once(stages, page_size):
+    data = main.SearchInput(query="kira sözleşmesi", mode="hybrid")
+    pages = walk(data, page_size)
+    returned = [d for page in pages for d in page]
+    assert returned == full_ranking()
+    assert len(set(returned)) == len(returned)
+    # Every page reads the stages equally deep, and later pages reuse the cached ranking
+    assert set(stages) == {hybrid_search.HYBRID_STAGE_DEPTH}
+    assert len(stages) == 1
+
+
+def test_offset_pages_cover_the_full_ranking_once(stages):
+    returned = []
+    for offset in range(0, len(VECTOR), 2):
+        data = main.SearchInput(query="kira sözleşmesi", mode="hybrid", offset=offset)
+        returned += [result["document_id"] for result in main.search_page(data, 2, None)["results"]]
+    assert returned == full_ranking()
+
+
+def test_stream_walks_every_page(stages):
+    data = main.SearchInput(query="kira sözleşmesi", mode="hybrid", top_k=1000, stream=True)
+    lines = [json.loads(line) for line in main.stream_search(data)]
+    assert [line["result"]["document_id"] for line in lines[:-1]] == full_ranking()
+    assert lines[-1] == {"done": True, "returned": len(VECTOR), "next_cursor": None}
+
+
+def test_cursor_from_another_query_is_rejected(stages):
+    data = main.SearchInput(query="kira sözleşmesi", mode="hybrid")
+    cursor = main.search_page(data, 2, None)["next_cursor"]
+    other = main.SearchInput(query="fatura", mode="hybrid")
+    with pytest.raises(main.search_cursor.InvalidCursor):
+        main.search_page(other, 2, cursor)
+
+
+@pytest.fixture
+def chunk_store(monkeypatch, tmp_path):
+    """One relevant 40-chunk document, then ten relevant single-chunk documents."""
+    store = NumpyVectorStore(str(tmp_path), compression="none")
+    rng = np.random.default_rng(0)
+    query = np.ones(16, dtype=np.float32)
+    vectors, metadatas = [], []
+    for chunk in range(40):
+        vectors.append(query + rng.normal(scale=0.01, size=16))
+        metadatas.append({"document_id": 1, "chunk_index": chunk})
+    for document_id in range(2, 12):
+        vectors.append(query + rng.normal(scale=0.5, size=16))
+        metadatas.append({"document_id": document_id, "chunk_index": 0})
+    for metadata in metadatas:
+        metadata.update(summary="", labels="", start=0, end=1, page=0)
+    store.add([f"{m['document_id']}:{m['chunk_index']}" for m in metadatas], np.array(vectors),
+              ["text"] * len(metadatas), metadatas)
+
+    monkeypatch.setattr(embedding_utils, "get_store", lambda: store)
+    monkeypatch.setattr(embedding_utils, "embed_query", lambda text: query)
+    search_cache.bump_collection_version()
+    return store
+
+
+def test_vector_search_fills_the_page_past_long_documents(chunk_store):
+    results = main.semantic_search("q", top_k=4)
+    assert len(results) == 4
+    assert results[0]["document_id"] == 1
+
+
+@pytest.mark.parametrize("page_size", [1, 3, 4, 11])
+def test_vector_cursor_pages_cover_every_document_once(chunk_store, page_size):
+    returned = [d for page in walk(main.SearchInput(query="q"), page_size) for d in page]
+    assert sorted(returned) == list(range(1, 12))
+    assert len(set(returned)) == len(returned)
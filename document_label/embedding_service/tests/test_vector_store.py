@@ -0,0 +1,78 @@
+import os
+import numpy as np
+import pytest
+from services.vector_store import NumpyVectorStore
+
+
+def unit_rows(n, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = NumpyVectorStore(str(tmp_path), compression="none")
+    vectors = unit_rows(100)
+    store.add([f"doc{i}" for i in range(100)], vectors, [f"text {i}" for i in range(100)],
+              [{"document_id": i, "even": i % 2 == 0} for i in range(100)])
+    return store
+
+
+def test_results_survive_a_compaction_during_the_query(store, monkeypatch):
+    query = unit_rows(100)[70]
+    search = store._search
+
+    def search_then_compact(*args, **kwargs):
+        hits = search(*args, **kwargs)
+        # Another request deletes enough rows to compact and renumber the rest
+        store.delete(ids=[f"doc{i}" for i in range(40)])
+        assert store.generation == 1
+        return hits
+
+    monkeypatch.setattr(store, "_search", search_then_compact)
+    result = store.query([query], n_results=5, include=["metadatas", "documents"])
+    assert result["ids"][0][0] == "doc70"
+    for id_, metadata, document in zip(result["ids"][0], result["metadatas"][0], result["documents"][0]):
+        assert metadata["document_id"] == int(id_[3:]) >= 40
+        assert document == f"text {id_[3:]}"
+
+
+def test_clear_removes_every_vector_and_file(store, tmp_path):
+    assert store.clear() == 100
+    assert store.count() == 0
+    assert store.query([unit_rows(1)[0]], n_results=5)["ids"] == [[]]
+    assert not any(name.startswith(("vectors", "records", "state")) for name in os.listdir(tmp_path))
+
+    store.add(["doc0"], unit_rows(1), ["again"], [{"document_id": 0}])
+    reopened = NumpyVectorStore(str(tmp_path), compression="none")
+    assert reopened.count() == 1
+    assert reopened.query([unit_rows(1)[0]], n_results=5, include=["documents"])["documents"] == [["again"]]
+
+
+def test_add_query_delete_round_trip(store, tmp_path):
+    vectors = unit_rows(100)
+    result = store.query(vectors[[3, 8]], n_results=3)
+    assert [ids[0] for ids in result["ids"]] == ["doc3", "doc8"]
+    assert result["distances"][0][0] == pytest.approx(0.0, abs=1e-5)
+    assert result["documents"][1][0] == "text 8"
+    assert result["metadatas"][1][0] == {"document_id": 8, "even": True}
+
+    # Existing ids are left untouched, as in Chroma
+    store.add(["doc3"], unit_rows(1, seed=1), ["replaced"], [{"document_id": -1}])
+    assert store.count() == 100
+    assert store.query(vectors[[3]], n_results=1, include=["documents"])["documents"] == [["text 3"]]
+
+    filtered = store.query(vectors[[3]], n_results=5, where={"even": True}, include=["metadatas"])
+    assert len(filtered["ids"][0]) == 5
+    assert all(metadata["even"] for metadata in filtered["metadatas"][0])
+
+    store.delete(ids=["doc3"])
+    store.delete(where={"document_id": 8})
+    assert store.count() == 98
+    assert "doc3" not in store.query(vectors[[3]], n_results=10)["ids"][0]
+
+    reopened = NumpyVectorStore(str(tmp_path), compression="none")
+    assert reopened.count() == 98
+    for query in (vectors[[3]], vectors[[50]]):
+        assert reopened.query(query, n_results=10)["ids"] == store.query(query, n_results=10)["ids"]
+
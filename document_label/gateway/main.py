@@ -1,8 +1,54 @@
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import StreamingResponse, JSONResponse
+from starlette.background import BackgroundTask
 import httpx
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+LABELING_URL = "http://labeling_service:1071"
+EMBEDDING_URL = "http://embedding_service:1071"
+
+# Upstream connection pool, shared by all requests
+GATEWAY_MAX_CONNECTIONS = int(os.getenv("GATEWAY_MAX_CONNECTIONS", "100"))
+GATEWAY_MAX_KEEPALIVE = int(os.getenv("GATEWAY_MAX_KEEPALIVE", "20"))
+GATEWAY_KEEPALIVE_EXPIRY = float(os.getenv("GATEWAY_KEEPALIVE_EXPIRY", "30"))
+GATEWAY_CONNECT_TIMEOUT = float(os.getenv("GATEWAY_CONNECT_TIMEOUT", "5"))
+# OCR + LLM analysis of a long PDF can take minutes
+GATEWAY_READ_TIMEOUT = float(os.getenv("GATEWAY_READ_TIMEOUT", "300"))
+
+# Hop-by-hop headers (RFC 7230 6.1) are never forwarded; host is rewritten by httpx
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "host"
+}
+
+# Timeout for probing the services' readiness from /health/ready
+GATEWAY_HEALTH_TIMEOUT = float(os.getenv("GATEWAY_HEALTH_TIMEOUT", "2"))
+
+_PROCESS_START = time.time()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start = time.perf_counter()
+    app.state.client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=GATEWAY_MAX_CONNECTIONS,
+            max_keepalive_connections=GATEWAY_MAX_KEEPALIVE,
+            keepalive_expiry=GATEWAY_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(GATEWAY_READ_TIMEOUT, connect=GATEWAY_CONNECT_TIMEOUT)
+    )
+    app.state.startup = {
+        "client_seconds": round(time.perf_counter() - start, 3),
+        "ready_after_start_seconds": round(time.time() - _PROCESS_START, 3)
+    }
+    yield
+    await app.state.client.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -11,27 +57,111 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
-LABELING_URL = "http://labeling_service:1071"
-EMBEDDING_URL = "http://embedding_service:1071"
+def _forward_headers(headers):
+    return {k: v for k, v in headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
 
 async def forward_request(request: Request, target_url: str):
-    async with httpx.AsyncClient() as client:
-        try:
-            body = await request.json()
-            response = await client.post(target_url, json=body)
-            return response.json()
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-        
+    """Proxy the request as a byte stream in both directions.
+
+    Bodies are never parsed or buffered, so JSON and multipart uploads
+    pass through the same way.
+    """
+    client: httpx.AsyncClient = request.app.state.client
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+    upstream_request = client.build_request(
+        request.method,
+        target_url,
+        params=request.query_params,
+        headers=_forward_headers(request.headers),
+        content=request.stream() if has_body else None
+    )
+    try:
+        upstream = await client.send(upstream_request, stream=True)
+    except httpx.TimeoutException as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        headers=_forward_headers(upstream.headers),
+        background=BackgroundTask(upstream.aclose)
+    )
+
 @app.post("/analyze-document")
 async def analyze_document(request: Request):
     return await forward_request(request=request, target_url=f"{LABELING_URL}/analyze-document")
 
+@app.post("/analyze-text")
+async def analyze_text(request: Request):
+    return await forward_request(request=request, target_url=f"{LABELING_URL}/analyze-text")
+
+@app.post("/ocr-document")
+async def ocr_document(request: Request):
+    return await forward_request(request=request, target_url=f"{LABELING_URL}/ocr-document")
+
 @app.post("/confirm-document")
-async def analyze_document(request: Request):
+async def confirm_document(request: Request):
     return await forward_request(request=request, target_url=f"{EMBEDDING_URL}/confirm-document")
 
+@app.post("/confirm-documents")
+async def confirm_documents(request: Request):
+    return await forward_request(request=request, target_url=f"{EMBEDDING_URL}/confirm-documents")
+
+@app.post("/blobs")
+async def upload_blob(request: Request):
+    return await forward_request(request=request, target_url=f"{EMBEDDING_URL}/blobs")
+
+@app.get("/blobs/{blob_id}")
+async def download_blob(request: Request, blob_id: str):
+    return await forward_request(request=request, target_url=f"{EMBEDDING_URL}/blobs/{blob_id}")
+
 @app.post("/search")
-async def analyze_document(request: Request):
+async def search(request: Request):
     return await forward_request(request=request, target_url=f"{EMBEDDING_URL}/search")
 
+@app.post("/jobs")
+async def submit_job(request: Request):
+    return await forward_request(request=request, target_url=f"{LABELING_URL}/jobs")
+
+@app.get("/jobs/{job_id}")
+async def get_job(request: Request, job_id: str):
+    return await forward_request(request=request, target_url=f"{LABELING_URL}/jobs/{job_id}")
+
+@app.get("/documents/{document_id}/ocr")
+async def get_document_ocr(request: Request, document_id: int):
+    return await forward_request(request=request, target_url=f"{LABELING_URL}/documents/{document_id}/ocr")
+
+# --- Health ---
+@app.get("/health/live")
+def liveness():
+    return {"status": "alive"}
+
+async def _upstream_ready(client: httpx.AsyncClient, url: str) -> bool:
+    try:
+        response = await client.get(f"{url}/health/ready", timeout=GATEWAY_HEALTH_TIMEOUT)
+        return response.status_code == 200
+    except httpx.HTTPError:
+        return False
+
+@app.get("/health/ready")
+async def readiness(request: Request):
+    """Ready when both services behind the gateway report ready."""
+    client: httpx.AsyncClient = request.app.state.client
+    labeling, embedding = await asyncio.gather(
+        _upstream_ready(client, LABELING_URL),
+        _upstream_ready(client, EMBEDDING_URL)
+    )
+    content = {
+        "status": "ready" if labeling and embedding else "not_ready",
+        "upstreams": {"labeling_service": labeling, "embedding_service": embedding}
+    }
+    return JSONResponse(status_code=200 if labeling and embedding else 503, content=content)
+
+@app.get("/health/startup")
+def startup_report(request: Request):
+    return {
+        "uptime_seconds": round(time.time() - _PROCESS_START, 3),
+        "components": {"http_client": request.app.state.startup}
+    }
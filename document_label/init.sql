@@ -7,8 +7,13 @@ CREATE TABLE documents (
     content TEXT,
     uploaded_at TIMESTAMP DEFAULT NOW(),
     created_at TIMESTAMP DEFAULT NOW(),
-    summary TEXT
-    byte BYTEA
+    summary TEXT,
+    blob_id CHAR(64),
+    content_hash CHAR(64),
+    ocr_id CHAR(64),
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        to_tsvector('turkish', coalesce(title, '') || ' ' || coalesce(content, ''))
+    ) STORED
 );
 
 -- ==============================
@@ -16,7 +21,8 @@ CREATE TABLE documents (
 -- ==============================
 CREATE TABLE labels (
     label_id SERIAL PRIMARY KEY,
-    label_name VARCHAR(255) UNIQUE NOT NULL
+    label_name VARCHAR(255) UNIQUE NOT NULL,
+    search_vector TSVECTOR GENERATED ALWAYS AS (to_tsvector('turkish', label_name)) STORED
 );
 
 -- ==============================
@@ -30,8 +36,33 @@ CREATE TABLE document_labels (
     FOREIGN KEY (label_id) REFERENCES labels(label_id) ON DELETE CASCADE
 );
 
+-- ==============================
+--  NEAR-DUPLICATE INDEX (MinHash signatures + LSH band buckets)
+-- ==============================
+CREATE TABLE document_minhash (
+    document_id INT PRIMARY KEY REFERENCES documents(document_id) ON DELETE CASCADE,
+    signature BYTEA NOT NULL
+);
+
+CREATE TABLE minhash_bands (
+    band SMALLINT NOT NULL,
+    bucket BIGINT NOT NULL,
+    document_id INT NOT NULL REFERENCES documents(document_id) ON DELETE CASCADE,
+    PRIMARY KEY (band, bucket, document_id)
+);
+
 -- ==============================
 --  INDEXES FOR PERFORMANCE
 -- ==============================
 CREATE INDEX idx_documents_title ON documents(title);       
 CREATE INDEX idx_labels_name ON labels(label_name);
+CREATE INDEX idx_documents_content_hash ON documents(content_hash);
+CREATE INDEX idx_documents_blob_id ON documents(blob_id);
+CREATE INDEX idx_documents_search ON documents USING GIN (search_vector);
+CREATE INDEX idx_labels_search ON labels USING GIN (search_vector);
+
+-- Search filters
+CREATE INDEX idx_documents_uploaded_at ON documents(uploaded_at);
+CREATE INDEX idx_documents_title_lower ON documents(lower(title));
+CREATE INDEX idx_labels_name_lower ON labels(lower(label_name));
+CREATE INDEX idx_document_labels_label ON document_labels(label_id);
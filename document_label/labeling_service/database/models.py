@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, Text, TIMESTAMP, ForeignKey, String
+from sqlalchemy import Column, Integer, Text, TIMESTAMP, ForeignKey, String, LargeBinary, SmallInteger, BigInteger, CHAR, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship
 from .db import Base
 from datetime import datetime
@@ -6,10 +7,22 @@ from datetime import datetime
 class Document(Base):
     __tablename__ = "documents"
     document_id = Column(Integer, primary_key=True, index=True)
+    title = Column(Text)
     content = Column(Text)
     uploaded_at = Column(TIMESTAMP, default=datetime.utcnow)
     created_at = Column(TIMESTAMP, default=datetime.utcnow)
     summary = Column(Text)
+    # SHA-256 id of the original file in the embedding service's blob store; the bytes live outside Postgres
+    blob_id = Column(CHAR(64), index=True)
+    # SHA-256 of the whitespace-normalized content, for exact duplicate lookups
+    content_hash = Column(CHAR(64), index=True)
+    # SHA-256 of the source PDF; key of the stored structured OCR output in the labeling service
+    ocr_id = Column(CHAR(64))
+    # Maintained by Postgres, GIN-indexed for lexical search
+    search_vector = Column(
+        TSVECTOR,
+        Computed("to_tsvector('turkish', coalesce(title, '') || ' ' || coalesce(content, ''))", persisted=True)
+    )
 
     labels = relationship("Label", secondary="document_labels", back_populates="documents")
 
@@ -17,6 +30,7 @@ class Label(Base):
     __tablename__ = "labels"
     label_id = Column(Integer, primary_key=True, index=True)
     label_name = Column(String(255), unique=True, nullable=False)
+    search_vector = Column(TSVECTOR, Computed("to_tsvector('turkish', label_name)", persisted=True))
 
     documents = relationship("Document", secondary="document_labels", back_populates="labels")
 
@@ -24,3 +38,14 @@ class DocumentLabel(Base):
     __tablename__ = "document_labels"
     document_id = Column(Integer, ForeignKey("documents.document_id"), primary_key=True)
     label_id = Column(Integer, ForeignKey("labels.label_id"), primary_key=True)
+
+class DocumentMinHash(Base):
+    __tablename__ = "document_minhash"
+    document_id = Column(Integer, ForeignKey("documents.document_id", ondelete="CASCADE"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+
+class MinHashBand(Base):
+    __tablename__ = "minhash_bands"
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.document_id", ondelete="CASCADE"), primary_key=True)
@@ -1,26 +1,234 @@
-from .models import Document, Label
+from datetime import timezone
+from sqlalchemy import select, delete, tuple_, func
+from sqlalchemy.dialects.postgresql import insert
+from .models import Document, Label, DocumentLabel, DocumentMinHash, MinHashBand
 from .db import SessionLocal
 
-def create_document(content, summary=None):
+def create_document(content, summary=None, title=None, blob_id=None, labels=None,
+                    content_hash=None, minhash=None, ocr_id=None):
+    """Insert a document and, if given, its labels and dedup keys in a single transaction.
+
+    ``minhash`` is a (signature_bytes, [(band, bucket), ...]) pair.
+    """
     session = SessionLocal()
-    doc = Document(content=content, summary=summary)
-    session.add(doc)
-    session.commit()
-    session.refresh(doc)
-    session.close()
-    return doc
+    try:
+        doc = Document(title=title, content=content, summary=summary, blob_id=blob_id,
+                       content_hash=content_hash, ocr_id=ocr_id)
+        session.add(doc)
+        session.flush()
+        if labels:
+            add_labels_to_document(doc.document_id, labels, session=session)
+        if minhash:
+            signature, bands = minhash
+            session.add(DocumentMinHash(document_id=doc.document_id, signature=signature))
+            session.execute(
+                insert(MinHashBand)
+                .values([{"band": band, "bucket": bucket, "document_id": doc.document_id} for band, bucket in bands])
+                .on_conflict_do_nothing()
+            )
+        session.commit()
+        session.refresh(doc)
+        return doc
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def add_labels_to_document(document_id, label_names, session=None):
+    """Attach many labels with three statements, whatever the label count.
+
+    Label names are upserted with INSERT ... ON CONFLICT, so concurrent
+    confirms sharing a new label do not race on the unique constraint.
+    Runs inside ``session`` when given, otherwise in its own transaction.
+    Returns the attached (label_id, label_name) rows.
+    """
+    # Sorted so concurrent upserts lock label rows in the same order
+    names = sorted({name.strip() for name in label_names if name and name.strip()})
+    if not names:
+        return []
+
+    own_session = session is None
+    if own_session:
+        session = SessionLocal()
+    try:
+        session.execute(
+            insert(Label)
+            .values([{"label_name": name} for name in names])
+            .on_conflict_do_nothing(index_elements=["label_name"])
+        )
+        rows = session.execute(
+            select(Label.label_id, Label.label_name).where(Label.label_name.in_(names))
+        ).all()
+        session.execute(
+            insert(DocumentLabel)
+            .values([{"document_id": document_id, "label_id": row.label_id} for row in rows])
+            .on_conflict_do_nothing()
+        )
+        if own_session:
+            session.commit()
+        return rows
+    except Exception:
+        if own_session:
+            session.rollback()
+        raise
+    finally:
+        if own_session:
+            session.close()
 
 def add_label_to_document(document_id, label_name):
+    rows = add_labels_to_document(document_id, [label_name])
+    return rows[0] if rows else None
+
+def delete_documents(document_ids):
+    """Remove documents with their labels links and dedup keys in one transaction."""
+    document_ids = list(document_ids)
+    if not document_ids:
+        return
     session = SessionLocal()
-    label = session.query(Label).filter_by(label_name=label_name).first()
-    if not label:
-        label = Label(label_name=label_name)
-        session.add(label)
+    try:
+        for model in (MinHashBand, DocumentMinHash, DocumentLabel, Document):
+            session.execute(delete(model).where(model.document_id.in_(document_ids)))
         session.commit()
-        session.refresh(label)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def find_documents_by_content_hash(content_hashes):
+    """Map each already stored content hash to one of its document ids."""
+    session = SessionLocal()
+    try:
+        rows = session.execute(
+            select(Document.content_hash, Document.document_id)
+            .where(Document.content_hash.in_(list(content_hashes)))
+        ).all()
+        return {row.content_hash: row.document_id for row in rows}
+    finally:
+        session.close()
+
+def find_minhash_candidates(bands):
+    """Signatures of stored documents sharing at least one LSH (band, bucket) key."""
+    session = SessionLocal()
+    try:
+        candidate_ids = (
+            select(MinHashBand.document_id)
+            .where(tuple_(MinHashBand.band, MinHashBand.bucket).in_(bands))
+            .distinct()
+        )
+        rows = session.execute(
+            select(DocumentMinHash.document_id, DocumentMinHash.signature)
+            .where(DocumentMinHash.document_id.in_(candidate_ids))
+        ).all()
+        return {row.document_id: bytes(row.signature) for row in rows}
+    finally:
+        session.close()
+
+def _naive_utc(value):
+    # uploaded_at is a naive UTC TIMESTAMP
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
-    doc = session.query(Document).get(document_id)
-    doc.labels.append(label)
-    session.commit()
-    session.close()
-    return label
+def document_filters(filters):
+    """SQL conditions on Document for search filters (labels: any of, uploaded range, title)."""
+    if not filters:
+        return []
+    conditions = []
+    labels = [label.strip().lower() for label in filters.get("labels") or [] if label.strip()]
+    if labels:
+        conditions.append(Document.document_id.in_(
+            select(DocumentLabel.document_id)
+            .join(Label, Label.label_id == DocumentLabel.label_id)
+            .where(func.lower(Label.label_name).in_(labels))
+        ))
+    if filters.get("uploaded_from"):
+        conditions.append(Document.uploaded_at >= _naive_utc(filters["uploaded_from"]))
+    if filters.get("uploaded_to"):
+        conditions.append(Document.uploaded_at <= _naive_utc(filters["uploaded_to"]))
+    if filters.get("title"):
+        conditions.append(func.lower(Document.title) == filters["title"].lower())
+    return conditions
+
+def lexical_search_documents(query, limit=10, filters=None):
+    """(document_id, rank) of documents whose title/content match the query, best first."""
+    session = SessionLocal()
+    try:
+        ts_query = func.websearch_to_tsquery("turkish", query)
+        rank = func.ts_rank_cd(Document.search_vector, ts_query).label("rank")
+        return session.execute(
+            select(Document.document_id, rank)
+            .where(Document.search_vector.op("@@")(ts_query), *document_filters(filters))
+            .order_by(rank.desc(), Document.document_id)
+            .limit(limit)
+        ).all()
+    finally:
+        session.close()
+
+def lexical_search_labels(query, limit=10, filters=None):
+    """(document_id, rank) of documents carrying a label that matches the query, best first."""
+    session = SessionLocal()
+    try:
+        ts_query = func.websearch_to_tsquery("turkish", query)
+        rank = func.max(func.ts_rank_cd(Label.search_vector, ts_query)).label("rank")
+        conditions = document_filters(filters)
+        statement = (
+            select(DocumentLabel.document_id, rank)
+            .join(Label, Label.label_id == DocumentLabel.label_id)
+        )
+        if conditions:
+            statement = statement.join(Document, Document.document_id == DocumentLabel.document_id)
+        return session.execute(
+            statement
+            .where(Label.search_vector.op("@@")(ts_query), *conditions)
+            .group_by(DocumentLabel.document_id)
+            .order_by(rank.desc(), DocumentLabel.document_id)
+            .limit(limit)
+        ).all()
+    finally:
+        session.close()
+
+def get_document_summaries(document_ids):
+    """Title, summary, upload time and label names per document, without content or file bytes."""
+    if not document_ids:
+        return {}
+    session = SessionLocal()
+    try:
+        rows = session.execute(
+            select(
+                Document.document_id,
+                Document.title,
+                Document.summary,
+                Document.uploaded_at,
+                func.array_remove(func.array_agg(Label.label_name), None).label("labels")
+            )
+            .outerjoin(DocumentLabel, DocumentLabel.document_id == Document.document_id)
+            .outerjoin(Label, Label.label_id == DocumentLabel.label_id)
+            .where(Document.document_id.in_(list(document_ids)))
+            .group_by(Document.document_id)
+        ).all()
+        return {row.document_id: row._asdict() for row in rows}
+    finally:
+        session.close()
+
+def get_document_ocr_id(document_id):
+    """The document's (document_id, ocr_id) row, or None when the document does not exist."""
+    session = SessionLocal()
+    try:
+        return session.execute(
+            select(Document.document_id, Document.ocr_id).where(Document.document_id == document_id)
+        ).first()
+    finally:
+        session.close()
+
+def get_document_texts(limit=None):
+    """(document_id, content, summary) rows, oldest first; used by offline benchmarks."""
+    session = SessionLocal()
+    try:
+        statement = select(Document.document_id, Document.content, Document.summary).order_by(Document.document_id)
+        if limit:
+            statement = statement.limit(limit)
+        return session.execute(statement).all()
+    finally:
+        session.close()
@@ -1,12 +1,36 @@
+import json
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, UploadFile, File
-from services.label_utils import extract_labels_and_keywords, summarize_with_groq
-from doctr.io import DocumentFile
-from doctr.models import ocr_predictor
+from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
+from pydantic import BaseModel
+from services.analyzer import (
+    analyze_pdf, analyze_text, aiter_extracted_pages, result_cache, ocr_store, save_pages, stored_pages,
+    EmptyDocumentError
+)
+from services.result_cache import sha256_hex, RESULT_CACHE_ENABLED
+from services.label_utils import llm_cache
+from services.job_queue import JobStore, JobWorkerPool
+from services import ocr_engine, lazy
+from database.operations import get_document_ocr_id
 
-app = FastAPI()
+class TextInput(BaseModel):
+    content: str
 
-# Load OCR model once (you can choose between 'db_resnet50' or 'db_mobilenet_v3')
-ocr_model = ocr_predictor(pretrained=True)
+job_store = JobStore()
+job_workers = JobWorkerPool(job_store, analyze_pdf)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_workers.start()
+    # The OCR model and Groq clients load on first use; warm-up only moves that off the first request
+    if lazy.WARMUP_ON_STARTUP:
+        lazy.warm_up()
+    yield
+    await job_workers.stop()
+    ocr_engine.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.post("/analyze-document")
 async def analyze_document(file: UploadFile = File(...)):
@@ -16,26 +40,126 @@ async def analyze_document(file: UploadFile = File(...)):
 
         # Read PDF bytes
         pdf_bytes = await file.read()
+        return await analyze_pdf(pdf_bytes)
 
-        # Load and parse PDF with DocTR
-        doc = DocumentFile.from_pdf(pdf_bytes)
-        result = ocr_model(doc)
-
-        # Extract text from OCR result
-        extracted_text = result.render().strip()
-        if not extracted_text:
-            raise HTTPException(status_code=422, detail="No readable text found in PDF")
-
-        # Apply your existing NLP pipeline
-        labels_keywords = extract_labels_and_keywords(extracted_text)
-        summary = summarize_with_groq(extracted_text)
-
-        return {
-            "labels": labels_keywords["labels"] + labels_keywords["keywords"],
-            "summary": summary
-        }
+    except HTTPException:
+        raise
+    except EmptyDocumentError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
+@app.post("/analyze-text")
+async def analyze_text_endpoint(data: TextInput):
+    """Label and summarize text that was already extracted by the caller."""
+    try:
+        return await analyze_text(data.content)
+    except EmptyDocumentError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
+
+@app.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...)):
+    """Queue a PDF for analysis and return immediately; poll /jobs/{job_id}."""
+    if file.content_type != "application/pdf":
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    # Spooling and the SQLite insert block; keep them off the event loop
+    job_id = await asyncio.to_thread(job_store.submit, await file.read(), filename=file.filename)
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/ocr-document")
+async def ocr_document(file: UploadFile = File(...)):
+    """Stream per-page text as NDJSON lines: text-layer pages first, then OCRed pages in completion order.
+
+    Each line carries its "source" ("text" or "ocr"). The X-OCR-Id header
+    is the id to pass to /confirm-document; pages of a PDF seen before are
+    served from the OCR store.
+    """
+    if file.content_type != "application/pdf":
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    pdf_bytes = await file.read()
+    ocr_id = sha256_hex(pdf_bytes)
+    stored = await asyncio.to_thread(stored_pages, ocr_id)
+
+    def line(index, text, source):
+        return json.dumps({"page": index, "source": source, "text": text}, ensure_ascii=False) + "\n"
+
+    async def page_lines():
+        if stored:
+            texts, sources = stored
+            for index, text in sorted(texts.items()):
+                yield line(index, text, sources[index])
+            return
+        page_texts, page_sources, page_structures = {}, {}, {}
+        async for index, text, source, structure in aiter_extracted_pages(pdf_bytes):
+            page_texts[index] = text
+            page_sources[index] = source
+            if structure:
+                page_structures[index] = structure
+            yield line(index, text, source)
+        # Only a complete run is stored; a client that disconnects early leaves nothing behind
+        await asyncio.to_thread(save_pages, ocr_id, page_texts, page_sources, page_structures)
+
+    headers = {"X-OCR-Id": ocr_id} if ocr_store is not None else {}
+    return StreamingResponse(page_lines(), media_type="application/x-ndjson", headers=headers)
+
+@app.get("/documents/{document_id}/ocr")
+def get_document_ocr(document_id: int):
+    """Stored OCR output of a confirmed document: gzip-compressed NDJSON, see OcrStore."""
+    row = get_document_ocr_id(document_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if not row.ocr_id or ocr_store is None or not ocr_store.exists(row.ocr_id):
+        raise HTTPException(status_code=404, detail="No stored OCR output for this document")
+    # Served as stored; clients decode it transparently via Content-Encoding
+    return FileResponse(
+        ocr_store.path(row.ocr_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Encoding": "gzip", "X-OCR-Id": row.ocr_id}
+    )
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "enabled": RESULT_CACHE_ENABLED,
+        **result_cache.stats(),
+        "llm": {"enabled": True, **llm_cache.stats()} if llm_cache is not None else {"enabled": False}
+    }
+
+@app.delete("/cache")
+def clear_cache():
+    return {
+        "cleared": result_cache.clear(),
+        "llm_cleared": llm_cache.clear() if llm_cache is not None else 0
+    }
+
+# --- Health ---
+@app.get("/health/live")
+def liveness():
+    """The process is up and serving requests."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness():
+    """503 until the OCR model and Groq client are loaded (or one of them failed to load)."""
+    report = lazy.startup_report()
+    if not report["ready"]:
+        return JSONResponse(status_code=503, content={"status": "not_ready", **report})
+    return {"status": "ready", **report}
+
+@app.get("/health/startup")
+def startup_report():
+    """Load time of each lazily initialised component."""
+    return lazy.startup_report()
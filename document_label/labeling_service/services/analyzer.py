@@ -0,0 +1,153 @@
+import time
+import asyncio
+from services.label_utils import analyze_content, PROMPT_VERSION
+from services.result_cache import (
+    PersistentLRUCache, RESULT_CACHE_ENABLED, RESULT_CACHE_PATH, RESULT_CACHE_MAX_BYTES,
+    pdf_key, text_key, sha256_hex
+)
+from services.ocr_store import OcrStore, OCR_STORE_ENABLED
+from services import ocr_engine, text_layer
+
+# Analysis results keyed by PDF hash and by normalized OCR text hash
+result_cache = PersistentLRUCache(RESULT_CACHE_PATH, PROMPT_VERSION, RESULT_CACHE_MAX_BYTES)
+# Structured extraction output per PDF, reused instead of running OCR again
+ocr_store = OcrStore() if OCR_STORE_ENABLED else None
+
+
+class EmptyDocumentError(ValueError):
+    """Neither the text layer nor OCR produced any text."""
+
+
+def _report(on_progress, stage: str, done: int, total: int):
+    if on_progress:
+        on_progress(stage, done, total)
+
+async def aiter_extracted_pages(pdf_bytes: bytes, on_progress=None):
+    """Yield (page_index, text, "text" | "ocr", structure) for every page.
+
+    Pages whose embedded text layer is usable come first; only the rest are
+    OCRed, in completion order. Structures exist for OCRed pages only.
+    """
+    # Parsing takes tens of milliseconds per page; keep it off the event loop
+    layer = await asyncio.to_thread(text_layer.extract_text_layer, pdf_bytes)
+    text_pages = {index: text for index, text in enumerate(layer) if text_layer.is_usable(text)}
+
+    # Unparseable PDF (empty layer): let the OCR engine count the pages itself
+    ocr_pages = [i for i in range(len(layer)) if i not in text_pages] if layer else None
+    if ocr_pages is None:
+        ocr_pages = list(range(await asyncio.to_thread(ocr_engine.page_count, pdf_bytes)))
+
+    total = len(text_pages) + len(ocr_pages)
+    for index, text in text_pages.items():
+        yield index, text, "text", {}
+    done = len(text_pages)
+    _report(on_progress, "pages", done, total)
+    if ocr_pages:
+        async for index, text, structure in ocr_engine.aiter_pages(pdf_bytes, pages=ocr_pages):
+            yield index, text, "ocr", structure
+            done += 1
+            _report(on_progress, "pages", done, total)
+
+async def extract_pages(pdf_bytes: bytes, on_progress=None):
+    """Use the embedded text layer where it is usable and OCR only the rest.
+
+    Returns ({page_index: text}, {page_index: "text" | "ocr"}, {page_index: structure});
+    structures exist for OCRed pages only.
+    """
+    page_texts = {}
+    page_sources = {}
+    page_structures = {}
+    async for index, text, source, structure in aiter_extracted_pages(pdf_bytes, on_progress=on_progress):
+        page_texts[index] = text
+        page_sources[index] = source
+        if structure:
+            page_structures[index] = structure
+    return page_texts, page_sources, page_structures
+
+def save_pages(ocr_id: str, page_texts: dict, page_sources: dict, page_structures: dict):
+    """Blocking gzip write; async callers run it with asyncio.to_thread."""
+    if ocr_store is None:
+        return
+    ocr_store.save(ocr_id, [
+        {"page": i, "source": page_sources[i], "text": page_texts[i], **page_structures.get(i, {})}
+        for i in page_texts
+    ])
+
+def stored_pages(ocr_id: str):
+    """Stored ({page_index: text}, {page_index: source}) for this PDF, or None."""
+    return ocr_store.page_texts(ocr_id) if ocr_store is not None else None
+
+async def analyze_pdf(pdf_bytes: bytes, on_progress=None):
+    """Full pipeline behind /analyze-document: cache lookups, text extraction, LLM analysis.
+
+    ``on_progress(stage, done, total)`` is called as pages are extracted
+    ("pages") and LLM calls finish ("llm").
+    """
+    # Pass ocr_id along to /confirm-document to link the stored OCR output to the document
+    ocr_id = sha256_hex(pdf_bytes)
+
+    # Same file uploaded before: skip OCR and LLM entirely
+    file_key = pdf_key(pdf_bytes)
+    cached = await result_cache.aget(file_key) if RESULT_CACHE_ENABLED else None
+    if cached:
+        stored = ocr_store is not None and ocr_store.exists(ocr_id)
+        return {**cached, "cache": "pdf", "ocr_id": ocr_id if stored else None}
+
+    # Stored extraction output first, then text layer + OCR page batches (off the event loop)
+    ocr_start = time.perf_counter()
+    stored = await asyncio.to_thread(stored_pages, ocr_id)
+    if stored:
+        page_texts, page_sources = stored
+    else:
+        page_texts, page_sources, page_structures = await extract_pages(pdf_bytes, on_progress=on_progress)
+        if page_texts:
+            await asyncio.to_thread(save_pages, ocr_id, page_texts, page_sources, page_structures)
+    pages = [{"page": i, "source": page_sources[i]} for i in sorted(page_sources)]
+
+    extracted_text = ocr_engine.join_pages(page_texts)
+    ocr_seconds = round(time.perf_counter() - ocr_start, 3)
+    if not extracted_text:
+        raise EmptyDocumentError("No readable text found in PDF")
+
+    result = await analyze_text(extracted_text, on_progress=on_progress)
+    if RESULT_CACHE_ENABLED:
+        await result_cache.aset(file_key, {"labels": result["labels"], "summary": result["summary"]})
+
+    return {
+        **result,
+        "ocr_id": ocr_id if ocr_store is not None else None,
+        "pages": pages,
+        "timings": {
+            "ocr_seconds": ocr_seconds,
+            "ocr_reused": bool(stored),
+            "ocr_pages": 0 if stored else sum(1 for source in page_sources.values() if source == "ocr"),
+            **result.get("timings", {})
+        }
+    }
+
+async def analyze_text(text: str, on_progress=None):
+    """LLM analysis of already extracted text, cached by the normalized text hash."""
+    text = text.strip()
+    if not text:
+        raise EmptyDocumentError("No readable text found in document")
+
+    # Different file, same text (re-scan, re-export): skip the LLM calls
+    content_key = text_key(text)
+    cached = await result_cache.aget(content_key) if RESULT_CACHE_ENABLED else None
+    if cached:
+        return {**cached, "cache": "text"}
+
+    # Labels, keyword chunks and summary are requested from Groq in parallel
+    analysis = await analyze_content(
+        text,
+        on_call_done=lambda done, total: _report(on_progress, "llm", done, total)
+    )
+
+    response = {
+        "labels": analysis["labels"] + analysis["keywords"],
+        "summary": analysis["summary"]
+    }
+    if RESULT_CACHE_ENABLED:
+        await result_cache.aset(content_key, response)
+
+    return {**response, "cache": None, "timings": analysis["timings"]}
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "cache/jobs.sqlite3")
+# Uploaded PDFs wait here until a worker picks them up
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", "cache/jobs")
+# Concurrent jobs per process; run more processes against the same JOB_DB_PATH to scale out
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+# A running job without a heartbeat for this long is assumed lost (crash, restart) and requeued
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Finished jobs are purged after this many seconds
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))
+
+
+class JobStore:
+    """Durable job table in SQLite, safe to share between processes on one host."""
+
+    def __init__(self, path: str = JOB_DB_PATH, spool_dir: str = JOB_SPOOL_DIR):
+        self.spool_dir = spool_dir
+        os.makedirs(spool_dir, exist_ok=True)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " filename TEXT,"
+            " progress TEXT NOT NULL DEFAULT '{}',"
+            " result TEXT,"
+            " error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " worker TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " heartbeat_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+
+    def _spool_path(self, job_id: str):
+        return os.path.join(self.spool_dir, f"{job_id}.pdf")
+
+    def _remove_spooled(self, job_ids):
+        # Every terminal transition ends here; the PDF is not needed once a job is done or failed
+        for job_id in job_ids:
+            try:
+                os.remove(self._spool_path(job_id))
+            except FileNotFoundError:
+                pass
+
+    def submit(self, pdf_bytes: bytes, filename: str = None) -> str:
+        job_id = uuid.uuid4().hex
+        # Spool first so a claimed job always has its file
+        with open(self._spool_path(job_id), "wb") as f:
+            f.write(pdf_bytes)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, status, filename, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, filename, now, now)
+            )
+        return job_id
+
+    def claim(self, worker: str):
+        """Atomically take the oldest queued job, requeueing lost ones first."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                lost = [r["job_id"] for r in self._conn.execute(
+                    "SELECT job_id FROM jobs WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                    (now - JOB_STALE_AFTER, JOB_MAX_ATTEMPTS)
+                )]
+                self._conn.executemany(
+                    "UPDATE jobs SET status = 'failed', error = 'Worker lost too many times', updated_at = ?"
+                    " WHERE job_id = ?",
+                    [(now, job_id) for job_id in lost]
+                )
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker = NULL, updated_at = ?"
+                    " WHERE status = 'running' AND heartbeat_at < ?",
+                    (now, now - JOB_STALE_AFTER)
+                )
+                row = self._conn.execute(
+                    "SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1,"
+                        " progress = '{}', updated_at = ?, heartbeat_at = ? WHERE job_id = ?",
+                        (worker, now, now, row["job_id"])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._remove_spooled(lost)
+        return row["job_id"] if row else None
+
+    def load_pdf(self, job_id: str) -> bytes:
+        with open(self._spool_path(job_id), "rb") as f:
+            return f.read()
+
+    def heartbeat(self, job_id: str, progress: dict = None):
+        now = time.time()
+        with self._lock:
+            if progress is None:
+                self._conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ?", (now, job_id))
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET progress = ?, heartbeat_at = ?, updated_at = ? WHERE job_id = ?",
+                    (json.dumps(progress), now, now, job_id)
+                )
+
+    def finish(self, job_id: str, result: dict = None, error: str = None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                ("failed" if error else "done", json.dumps(result, ensure_ascii=False) if result else None,
+                 error, now, job_id)
+            )
+            expired = [r["job_id"] for r in self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (now - JOB_RETENTION,)
+            )]
+            self._conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(j,) for j in expired])
+        self._remove_spooled([job_id] + expired)
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        return {
+            "job_id": row["job_id"],
+            "status": row["status"],
+            "filename": row["filename"],
+            "progress": json.loads(row["progress"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+
+class JobWorkerPool:
+    """Runs ``handler(pdf_bytes, on_progress)`` for claimed jobs, JOB_WORKERS at a time.
+
+    JobStore calls block on SQLite (up to its 30 s busy timeout while another
+    process holds the write lock), so they run on one store thread, never on
+    the event loop. One thread keeps heartbeats of a job in order.
+    """
+
+    def __init__(self, store: JobStore, handler, concurrency: int = JOB_WORKERS):
+        self.store = store
+        self.handler = handler
+        self.concurrency = concurrency
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks = []
+        self._store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+
+    def _store_call(self, fn, *args, **kwargs):
+        return asyncio.get_running_loop().run_in_executor(self._store_executor, lambda: fn(*args, **kwargs))
+
+    def start(self):
+        for i in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._run(f"{self.worker_id}:{i}")))
+        logging.info(f"Started {self.concurrency} job workers ({self.worker_id})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._store_executor.shutdown(wait=False)
+
+    async def _run(self, worker: str):
+        while True:
+            try:
+                job_id = await self._store_call(self.store.claim, worker)
+            except Exception as e:
+                logging.warning(f"Job claim failed: {e}")
+                job_id = None
+            if job_id is None:
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+                continue
+            await self._process(job_id)
+
+    async def _process(self, job_id: str):
+        progress = {}
+
+        def on_progress(stage, done, total):
+            progress[stage] = {"done": done, "total": total}
+            # Called from the handler's coroutine: queued, not awaited; a lost update is only progress
+            self._store_call(self.store.heartbeat, job_id, dict(progress)).add_done_callback(_log_failure)
+
+        async def keep_alive():
+            while True:
+                await asyncio.sleep(JOB_STALE_AFTER / 4)
+                try:
+                    await self._store_call(self.store.heartbeat, job_id)
+                except Exception as e:
+                    logging.warning(f"Job {job_id} heartbeat failed: {e}")
+
+        beat = asyncio.create_task(keep_alive())
+        try:
+            pdf_bytes = await self._store_call(self.store.load_pdf, job_id)
+            result = await self.handler(pdf_bytes, on_progress)
+            await self._store_call(self.store.finish, job_id, result=result)
+        except asyncio.CancelledError:
+            # Shutting down: leave the job running so it is requeued once stale
+            raise
+        except Exception as e:
+            logging.exception(f"Job {job_id} failed")
+            await self._store_call(self.store.finish, job_id, error=str(e))
+        finally:
+            beat.cancel()
+
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logging.warning(f"Job progress update failed: {future.exception()}")
@@ -1,105 +1,206 @@
 import os
 import json
+import hashlib
 import time
+import asyncio
 import logging
 from dotenv import load_dotenv
-from groq import Groq
+from groq import AsyncGroq
+from services.lazy import LazyResource
+from services.result_cache import (
+    PersistentLRUCache, LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES, LLM_CACHE_MAX_AGE,
+    LLM_CACHE_VERSION, llm_key, normalize_text
+)
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-if not GROQ_API_KEY:
-    logging.error("GROQ_API_KEY missing in .env")
-    exit(1)
 
-client = Groq(api_key=GROQ_API_KEY)
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama3-70b-8192")
+# Upper bound on in-flight Groq requests per process (rate limits are per key)
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "4"))
+
+def _groq_api_key():
+    if not GROQ_API_KEY:
+        raise RuntimeError("GROQ_API_KEY missing in .env")
+    return GROQ_API_KEY
+
+# Created on first use: without a key the service still starts and reports not ready
+async_client = LazyResource("groq_async", lambda: AsyncGroq(api_key=_groq_api_key()))
+_groq_semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+# Completions shared by re-analyzed documents and by chunks repeated across documents
+llm_cache = PersistentLRUCache(LLM_CACHE_PATH, LLM_CACHE_VERSION, LLM_CACHE_MAX_BYTES, LLM_CACHE_MAX_AGE) \
+    if LLM_CACHE_ENABLED else None
+
+# --- Prompts ---
+LABEL_PROMPT = (
+    "Sen bir Türkçe belge sınıflandırma uzmanısın. "
+    "Aşağıdaki belgeyi inceleyerek 3 ila 7 arasında kısa, anlamlı ve konuya özgü etiket üret. "
+    "Etiketler yalnızca belge içeriğiyle ilgili olmalı; genel ifadelerden kaçın. "
+    "Yanıt olarak sadece geçerli bir JSON dizisi döndür:"
+    "Ek açıklama, metin veya biçimlendirme kullanma."
+)
+
+KEYWORD_PROMPT = (
+    "Sen bir belge analiz uzmanısın. "
+    "Aşağıdaki metni inceleyerek en kritik ve sık geçen anahtar kelimeleri çıkar. "
+    "Tarihleri (gün/ay/yıl), telefon numaralarını, banka hesap numaralarını ve şirket adlarını tam haliyle dahil et. "
+    "Yanıt olarak yalnızca geçerli bir JSON dizisi döndür: örnek ['ABC Holding', '01/03/2023', 'TR12 0001 1000 0000 0000 5000 01']. "
+    "Ek açıklama, metin veya biçimlendirme kullanma."
+)
+
+SUMMARY_PROMPT = (
+    "You are a helpful assistant that summarizes Turkish business documents. "
+    "Create a concise summary (max 5-7 sentences) of the document below in Turkish. "
+    "Do not include emojis, filler, or repetition. Just return plain summary text."
+)
+
+# Identifies the model + prompt set; cached analysis results written under a
+# different version are discarded. RESULT_CACHE_VERSION forces a manual bump.
+PROMPT_VERSION = hashlib.sha256(
+    "\n".join([GROQ_MODEL, LABEL_PROMPT, KEYWORD_PROMPT, SUMMARY_PROMPT]).encode("utf-8")
+).hexdigest()[:16] + os.getenv("RESULT_CACHE_VERSION", "")
 
 # --- Helpers ---
-def safe_json_extract(text: str):
-    """Extract JSON array from text safely."""
+def _parse_json_array(text: str):
+    """The JSON array in text, or None if there is none."""
     text = text.strip()
     if text.startswith("```"):
         text = "\n".join(text.split("\n")[1:-1]).strip()
     start = text.find("[")
     end = text.rfind("]") + 1
-    if start == -1 or end == -1:
-        return []
+    if start == -1 or end == 0:
+        return None
     try:
-        return json.loads(text[start:end])
-    except:
+        parsed = json.loads(text[start:end])
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, list) else None
+
+def _is_json_array(text: str) -> bool:
+    return _parse_json_array(text) is not None
+
+def safe_json_extract(text: str):
+    """Extract JSON array from text safely."""
+    parsed = _parse_json_array(text)
+    if parsed is None:
         logging.warning("Failed to parse JSON response.")
         return []
+    return parsed
+
+async def _cache_lookup(messages):
+    """(key, cached completion or None); the key is None when the LLM cache is off."""
+    if llm_cache is None:
+        return None, None
+    key = llm_key(GROQ_MODEL, messages[0]["content"], messages[-1]["content"])
+    return key, await llm_cache.aget(key)
 
-def call_groq(messages, retries=3, delay=1):
+async def _cache_store(key, text: str, accept=None):
+    # Failed calls return "" and are retried next time; so are completions ``accept`` rejects
+    if key is not None and text and (accept is None or accept(text)):
+        await llm_cache.aset(key, text)
+
+async def call_groq_async(messages, retries=3, delay=1, report: dict = None, accept=None):
+    """``report``, if given, gets "cache": "hit", "miss" or "off".
+
+    Only completions for which ``accept(text)`` is true are cached.
+    """
+    key, cached = await _cache_lookup(messages)
+    if report is not None:
+        report["cache"] = "off" if key is None else "hit" if cached is not None else "miss"
+    if cached is not None:
+        return cached
+    groq = async_client.get()
     for attempt in range(retries):
         try:
-            response = client.chat.completions.create(
-                model="llama3-70b-8192",
-                messages=messages
-            )
-            return response.choices[0].message.content.strip()
+            # Only the request itself holds a slot; backoff sleeps do not
+            async with _groq_semaphore:
+                response = await groq.chat.completions.create(
+                    model=GROQ_MODEL,
+                    messages=messages
+                )
+            text = response.choices[0].message.content.strip()
+            await _cache_store(key, text, accept)
+            return text
         except Exception as e:
             logging.warning(f"Groq attempt {attempt+1} failed: {e}")
-            time.sleep(delay * (2 ** attempt))
+            await asyncio.sleep(delay * (2 ** attempt))
     return ""
 
 def chunk_text(text, max_len=3000):
     return [text[i:i+max_len] for i in range(0, len(text), max_len)]
 
-# --- Combined Labels + Keywords ---
-def extract_labels_and_keywords(content: str):
-    label_prompt = (
-        "Sen bir Türkçe belge sınıflandırma uzmanısın. "
-        "Aşağıdaki belgeyi inceleyerek 3 ila 7 arasında kısa, anlamlı ve konuya özgü etiket üret. "
-        "Etiketler yalnızca belge içeriğiyle ilgili olmalı; genel ifadelerden kaçın. "
-        "Yanıt olarak sadece geçerli bir JSON dizisi döndür:"
-        "Ek açıklama, metin veya biçimlendirme kullanma."
-    )
+# --- Concurrent analysis ---
+def _messages(system_prompt: str, content: str):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": content}
+    ]
 
-    keyword_prompt = (
-        "Sen bir belge analiz uzmanısın. "
-        "Aşağıdaki metni inceleyerek en kritik ve sık geçen anahtar kelimeleri çıkar. "
-        "Tarihleri (gün/ay/yıl), telefon numaralarını, banka hesap numaralarını ve şirket adlarını tam haliyle dahil et. "
-        "Yanıt olarak yalnızca geçerli bir JSON dizisi döndür: örnek ['ABC Holding', '01/03/2023', 'TR12 0001 1000 0000 0000 5000 01']. "
-        "Ek açıklama, metin veya biçimlendirme kullanma."
-    )
+async def _timed_call(name: str, messages, timings: list, on_done=None, accept=None):
+    start = time.perf_counter()
+    timing = {"call": name}
+    result = await call_groq_async(messages, report=timing, accept=accept)
+    timing["seconds"] = round(time.perf_counter() - start, 3)
+    timings.append(timing)
+    if on_done:
+        on_done()
+    return result
 
-    # Labels
-    raw_labels = call_groq([
-        {"role": "system", "content": label_prompt},
-        {"role": "user", "content": content}
-    ])
-    labels = safe_json_extract(raw_labels)
+async def analyze_content(content: str, on_call_done=None):
+    """Run the label, keyword-chunk and summary calls concurrently.
 
-    # Keywords with chunking
-    keywords = []
-    if len(content) > 3000:
-        for chunk in chunk_text(content):
-            raw_kw = call_groq([
-                {"role": "system", "content": keyword_prompt},
-                {"role": "user", "content": chunk}
-            ])
-            keywords += safe_json_extract(raw_kw)
-        keywords = list(set(keywords))
-    else:
-        raw_kw = call_groq([
-            {"role": "system", "content": keyword_prompt},
-            {"role": "user", "content": content}
-        ])
-        keywords = safe_json_extract(raw_kw)
-
-    return {"labels": labels, "keywords": keywords}
-
-# --- Summary ---
-def summarize_with_groq(content: str):
-    summary_prompt = (
-        "You are a helpful assistant that summarizes Turkish business documents. "
-        "Create a concise summary (max 5-7 sentences) of the document below in Turkish. "
-        "Do not include emojis, filler, or repetition. Just return plain summary text."
+    Returns labels, keywords and summary plus a per-call latency and LLM
+    cache breakdown. ``on_call_done(done, total)`` is called after each
+    finished call.
+    """
+    timings = []
+    start = time.perf_counter()
+
+    chunks = chunk_text(content) if len(content) > 3000 else [content]
+    # A chunk repeated within the document (letterheads, boilerplate) is sent once;
+    # keywords from all chunks are de-duplicated anyway
+    unique_chunks = {}
+    for chunk in chunks:
+        unique_chunks.setdefault(normalize_text(chunk), chunk)
+    repeated_chunks = len(chunks) - len(unique_chunks)
+    chunks = list(unique_chunks.values())
+    total_calls = 2 + len(chunks)
+
+    def call_done():
+        if on_call_done:
+            on_call_done(len(timings), total_calls)
+    raw_labels, raw_summary, *raw_keywords = await asyncio.gather(
+        _timed_call("labels", _messages(LABEL_PROMPT, content), timings, call_done, _is_json_array),
+        _timed_call("summary", _messages(SUMMARY_PROMPT, content), timings, call_done),
+        *[
+            _timed_call(f"keywords[{i}]", _messages(KEYWORD_PROMPT, chunk), timings, call_done, _is_json_array)
+            for i, chunk in enumerate(chunks)
+        ]
     )
-    raw_summary = call_groq([
-        {"role": "system", "content": summary_prompt},
-        {"role": "user", "content": content}
-    ])
-    return raw_summary.strip()
+
+    keywords = []
+    for raw_kw in raw_keywords:
+        keywords += safe_json_extract(raw_kw)
+    if len(chunks) > 1:
+        keywords = list(dict.fromkeys(keywords))
+
+    hits = sum(t["cache"] == "hit" for t in timings)
+    return {
+        "labels": safe_json_extract(raw_labels),
+        "keywords": keywords,
+        "summary": raw_summary.strip(),
+        "timings": {
+            "llm_calls": timings,
+            "llm_total_seconds": round(time.perf_counter() - start, 3),
+            "llm_sequential_seconds": round(sum(t["seconds"] for t in timings), 3),
+            "llm_cache": {
+                "enabled": llm_cache is not None,
+                "hits": hits,
+                "misses": sum(t["cache"] == "miss" for t in timings),
+                "hit_rate": round(hits / len(timings), 3) if timings else 0.0,
+                "repeated_chunks_skipped": repeated_chunks
+            }
+        }
+    }
@@ -0,0 +1,154 @@
+import os
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pypdfium2 as pdfium
+from services.lazy import LazyResource
+
+# Pages rasterized and fed to the predictor per call
+OCR_PAGE_BATCH_SIZE = int(os.getenv("OCR_PAGE_BATCH_SIZE", "4"))
+# 0 runs batches on a single background thread; N > 0 spreads them over N processes
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0"))
+# Torch intra-op threads per worker process, keeps N workers from oversubscribing cores
+OCR_THREADS_PER_WORKER = int(os.getenv("OCR_THREADS_PER_WORKER", "1"))
+# Same default scale as DocumentFile.from_pdf (which also renders in RGB order, see ocr_batch)
+OCR_RENDER_SCALE = float(os.getenv("OCR_RENDER_SCALE", "2"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# --- Model ---
+def _load_predictor():
+    from doctr.models import ocr_predictor
+    logging.info("Loading docTR OCR predictor...")
+    return ocr_predictor(pretrained=True)
+
+# With worker processes the parent never runs the model, so it is not warmed up there
+_predictor = LazyResource("ocr_predictor", _load_predictor, register=OCR_WORKERS == 0)
+
+def get_predictor():
+    """Load the docTR predictor once per process."""
+    return _predictor.get()
+
+def _ping():
+    return True
+
+def _start_workers():
+    """Spawn the worker processes and wait until they have loaded the model."""
+    executor = _get_executor()
+    for future in [executor.submit(_ping) for _ in range(OCR_WORKERS)]:
+        future.result()
+    return executor
+
+if OCR_WORKERS > 0:
+    LazyResource("ocr_workers", _start_workers)
+
+def _init_worker():
+    import torch
+    torch.set_num_threads(OCR_THREADS_PER_WORKER)
+    get_predictor()
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if OCR_WORKERS > 0:
+                # spawn: forking a parent that already holds torch state is unsafe
+                _executor = ProcessPoolExecutor(
+                    max_workers=OCR_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker
+                )
+            else:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr")
+    return _executor
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+# --- Pages ---
+def page_count(pdf_bytes: bytes) -> int:
+    pdf = pdfium.PdfDocument(pdf_bytes)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+def _batches(pages, size):
+    pages = list(pages)
+    return [pages[i:i + size] for i in range(0, len(pages), size)]
+
+def _flat_geometry(geometry):
+    """((x0, y0), (x1, y1)) relative coordinates as a flat, rounded list."""
+    return [round(float(c), 4) for point in geometry for c in point]
+
+def page_structure(page) -> dict:
+    """Column-oriented copy of a docTR page: blocks, lines and words with boxes and confidences.
+
+    ``lines.block`` and ``words.line`` index into the parent column, so the
+    hierarchy survives without nesting.
+    """
+    structure = {
+        "dimensions": list(page.dimensions),
+        "blocks": {"geometry": []},
+        "lines": {"block": [], "geometry": []},
+        "words": {"line": [], "value": [], "confidence": [], "geometry": []}
+    }
+    blocks, lines, words = structure["blocks"], structure["lines"], structure["words"]
+    for block in page.blocks:
+        block_index = len(blocks["geometry"])
+        blocks["geometry"].append(_flat_geometry(block.geometry))
+        for line in block.lines:
+            line_index = len(lines["geometry"])
+            lines["block"].append(block_index)
+            lines["geometry"].append(_flat_geometry(line.geometry))
+            for word in line.words:
+                words["line"].append(line_index)
+                words["value"].append(word.value)
+                words["confidence"].append(round(float(word.confidence), 4))
+                words["geometry"].append(_flat_geometry(word.geometry))
+    return structure
+
+def ocr_batch(pdf_bytes: bytes, page_indices):
+    """Rasterize only the given pages and run them through the predictor together.
+
+    Returns (page_index, text, structure) triples; see page_structure.
+    """
+    pdf = pdfium.PdfDocument(pdf_bytes)
+    try:
+        # RGB, like DocumentFile.from_pdf; pdfium renders BGR by default
+        images = [pdf[i].render(scale=OCR_RENDER_SCALE, rev_byteorder=True).to_numpy() for i in page_indices]
+    finally:
+        pdf.close()
+    result = get_predictor()(images)
+    return [
+        (index, page.render().strip(), page_structure(page))
+        for index, page in zip(page_indices, result.pages)
+    ]
+
+async def aiter_pages(pdf_bytes: bytes, pages=None, batch_size: int = None):
+    """Yield (page_index, text, structure) as each page batch completes.
+
+    Batches run off the event loop; completion order is not page order.
+    """
+    if pages is None:
+        pages = range(await asyncio.to_thread(page_count, pdf_bytes))
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    tasks = [
+        loop.run_in_executor(executor, ocr_batch, pdf_bytes, batch)
+        for batch in _batches(pages, batch_size or OCR_PAGE_BATCH_SIZE)
+    ]
+    for next_done in asyncio.as_completed(tasks):
+        for page in await next_done:
+            yield page
+
+def join_pages(page_texts: dict) -> str:
+    """Join per-page texts in page order, the same way docTR renders a document."""
+    return "\n\n\n\n".join(page_texts[i] for i in sorted(page_texts)).strip()
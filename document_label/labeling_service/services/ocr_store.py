@@ -0,0 +1,65 @@
+import os
+import gzip
+import json
+import logging
+
+OCR_STORE_ENABLED = os.getenv("OCR_STORE_ENABLED", "1") == "1"
+OCR_STORE_DIR = os.getenv("OCR_STORE_DIR", "cache/ocr")
+# gzip level: 6 is zlib's default balance of speed and size
+OCR_STORE_COMPRESSION = int(os.getenv("OCR_STORE_COMPRESSION", "6"))
+OCR_STORE_FORMAT = 1
+
+
+class OcrStore:
+    """Extraction output per PDF, as gzip-compressed JSON lines on disk.
+
+    The id is the SHA-256 of the PDF bytes. The first line is a header
+    ({"format", "pages"}), then one line per page in page order:
+    {"page", "source", "text"}, plus the columnar docTR structure (see
+    ocr_engine.page_structure) for OCRed pages. Text-layer pages have no
+    boxes to store. Page images are not kept: they re-render identically
+    from the PDF at OCR_RENDER_SCALE.
+    """
+
+    def __init__(self, directory: str = OCR_STORE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, ocr_id: str) -> str:
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.directory, ocr_id[:2], f"{ocr_id}.jsonl.gz")
+
+    def exists(self, ocr_id: str) -> bool:
+        return os.path.exists(self.path(ocr_id))
+
+    def save(self, ocr_id: str, pages: list[dict]):
+        """Write atomically, so readers never see a half-written file."""
+        path = self.path(ocr_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=OCR_STORE_COMPRESSION) as f:
+            f.write(json.dumps({"format": OCR_STORE_FORMAT, "pages": len(pages)}) + "\n")
+            for page in sorted(pages, key=lambda p: p["page"]):
+                f.write(json.dumps(page, ensure_ascii=False, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, path)
+
+    def load(self, ocr_id: str):
+        """All page records, or None when nothing (readable) is stored."""
+        try:
+            with gzip.open(self.path(ocr_id), "rt", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                if header.get("format") != OCR_STORE_FORMAT:
+                    return None
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError) as e:
+            logging.warning(f"Unreadable OCR record {ocr_id}: {e}")
+            return None
+
+    def page_texts(self, ocr_id: str):
+        """({page_index: text}, {page_index: source}) like analyzer.extract_pages, or None."""
+        pages = self.load(ocr_id)
+        if pages is None:
+            return None
+        return {p["page"]: p["text"] for p in pages}, {p["page"]: p["source"] for p in pages}
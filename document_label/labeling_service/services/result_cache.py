@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") == "1"
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "cache/results.sqlite3")
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Raw LLM completions per (model, system prompt, user content)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "cache/llm.sqlite3")
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+# Seconds; model behaviour drifts even under the same name
+LLM_CACHE_MAX_AGE = float(os.getenv("LLM_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+# Model and prompt are part of every key; bump this to drop all entries anyway
+LLM_CACHE_VERSION = os.getenv("LLM_CACHE_VERSION", "1")
+# The byte total is tracked per write; every this many writes it is recounted to pick up other processes' writes
+CACHE_SIZE_RECOUNT_WRITES = int(os.getenv("CACHE_SIZE_RECOUNT_WRITES", "1000"))
+
+# --- Keys ---
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so OCR runs that differ only in layout share a key."""
+    return " ".join(text.split())
+
+def pdf_key(pdf_bytes: bytes) -> str:
+    return f"pdf:{sha256_hex(pdf_bytes)}"
+
+def text_key(text: str) -> str:
+    return f"text:{sha256_hex(normalize_text(text).encode('utf-8'))}"
+
+def llm_key(model: str, system_prompt: str, content: str) -> str:
+    prompt_hash = sha256_hex(system_prompt.encode("utf-8"))[:16]
+    return f"llm:{model}:{prompt_hash}:{sha256_hex(normalize_text(content).encode('utf-8'))}"
+
+# --- Store ---
+class PersistentLRUCache:
+    """SQLite-backed JSON cache with size-bounded LRU eviction.
+
+    Every entry is tagged with ``version``; entries written under another
+    version are treated as misses and purged on startup, so bumping the
+    version invalidates the whole cache. Calls block on SQLite; async code
+    uses ``aget``/``aset``, which run them on a worker thread.
+    """
+
+    def __init__(self, path: str, version: str, max_bytes: int, max_age: float = None):
+        self.path = path
+        self.version = version
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " version TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_created ON entries(created_at)")
+        purged = self._conn.execute("DELETE FROM entries WHERE version != ?", (version,)).rowcount
+        if purged:
+            logging.info(f"Purged {purged} cache entries from {path} (version changed)")
+        self._bytes = self._count_bytes()
+        self._writes = 0
+
+    def _count_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at, size FROM entries WHERE key = ? AND version = ?",
+                (key, self.version)
+            ).fetchone()
+            if row and self.max_age is not None and now - row[1] > self.max_age:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._bytes -= row[2]
+                row = None
+            if not row:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value):
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            replaced = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, version, value, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, self.version, payload, size, now, now)
+            )
+            self._bytes += size - (replaced[0] if replaced else 0)
+            self._writes += 1
+            if self._writes % CACHE_SIZE_RECOUNT_WRITES == 0:
+                self._bytes = self._count_bytes()
+            self._evict()
+
+    async def aget(self, key: str):
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value):
+        await asyncio.to_thread(self.set, key, value)
+
+    def _evict(self):
+        if self.max_age is not None:
+            # Both statements use idx_entries_created, so they touch only the expired rows
+            cutoff = time.time() - self.max_age
+            expired = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries WHERE created_at < ?", (cutoff,)
+            ).fetchone()[0]
+            if expired:
+                self._conn.execute("DELETE FROM entries WHERE created_at < ?", (cutoff,))
+                self._bytes -= expired
+        excess = self._bytes - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            victims.append((key,))
+            excess -= size
+            self._bytes -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        logging.info(f"Evicted {len(victims)} cache entries from {self.path}")
+
+    def clear(self):
+        with self._lock:
+            cleared = self._conn.execute("DELETE FROM entries").rowcount
+            self._bytes = 0
+            return cleared
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {
+            "version": self.version,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -0,0 +1,56 @@
+import io
+import os
+import re
+import logging
+from PyPDF2 import PdfReader
+
+# A page's embedded text is trusted only if it is long and clean enough
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", "20"))
+TEXT_LAYER_MIN_QUALITY = float(os.getenv("TEXT_LAYER_MIN_QUALITY", "0.8"))
+
+_CID_PATTERN = re.compile(r"\(cid:\d+\)")
+_PUNCTUATION = set(".,;:!?()[]{}-–—_/\\'\"%&@€₺$+*#=<>|°")
+
+def clean_pdf_text(text):
+    # Normalize whitespace
+    text = re.sub(r'\s+', ' ', text)
+    # Fix hyphenation across lines
+    text = re.sub(r'(?<=\w)-\s+(?=\w)', '', text)
+    return text.strip()
+
+def text_quality(text: str) -> float:
+    """Share of characters that look like real text.
+
+    Unmapped glyphs show up as "(cid:N)" runs, U+FFFD or private-use
+    characters; those count as garbage.
+    """
+    if not text:
+        return 0.0
+    garbage = sum(len(m) for m in _CID_PATTERN.findall(text))
+    text = _CID_PATTERN.sub("", text)
+    good = sum(1 for c in text if c.isalnum() or c.isspace() or c in _PUNCTUATION)
+    return good / (len(text) + garbage)
+
+def is_usable(text: str) -> bool:
+    return len(text) >= TEXT_LAYER_MIN_CHARS and text_quality(text) >= TEXT_LAYER_MIN_QUALITY
+
+def extract_text_layer(pdf_bytes: bytes):
+    """Return the cleaned embedded text of every page ("" where extraction fails).
+
+    An empty list means the PDF could not be parsed at all.
+    """
+    try:
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        pages = reader.pages
+    except Exception as e:
+        logging.warning(f"Failed to read PDF text layer: {e}")
+        return []
+
+    texts = []
+    for index, page in enumerate(pages):
+        try:
+            texts.append(clean_pdf_text(page.extract_text() or ""))
+        except Exception as e:
+            logging.warning(f"Failed to extract text layer of page {index}: {e}")
+            texts.append("")
+    return texts
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# Services are imported as top-level packages (services.*, database.*), as in the container
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Module-level caches and stores open their files on import; keep them out of the working tree
+_cache_dir = tempfile.mkdtemp(prefix="labeling-tests-")
+for name, default in (("RESULT_CACHE_PATH", "results.sqlite3"), ("LLM_CACHE_PATH", "llm.sqlite3"),
+                      ("OCR_STORE_DIR", "ocr"), ("JOB_DB_PATH", "jobs.sqlite3"), ("JOB_SPOOL_DIR", "jobs")):
+    os.environ.setdefault(name, os.path.join(_cache_dir, default))
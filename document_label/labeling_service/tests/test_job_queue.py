@@ -0,0 +1,115 @@
+import os
+import asyncio
+import pytest
+from services import job_queue
+from services.job_queue import JobStore, JobWorkerPool
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "spool"))
+
+
+def spooled(store):
+    return sorted(name[:-4] for name in os.listdir(store.spool_dir))
+
+
+def lose_worker(store, job_id):
+    """The worker running the job stopped sending heartbeats long ago."""
+    store._conn.execute("UPDATE jobs SET heartbeat_at = heartbeat_at - ? WHERE job_id = ?",
+                        (job_queue.JOB_STALE_AFTER + 1, job_id))
+
+
+def test_claim_takes_queued_jobs_oldest_first(store):
+    first = store.submit(b"%PDF first", filename="a.pdf")
+    second = store.submit(b"%PDF second", filename="b.pdf")
+    assert store.get(first)["status"] == "queued"
+    assert spooled(store) == sorted([first, second])
+
+    assert store.claim("w1") == first
+    assert store.claim("w2") == second
+    assert store.claim("w3") is None
+    job = store.get(first)
+    assert job["status"] == "running" and job["attempts"] == 1 and job["filename"] == "a.pdf"
+    assert store.load_pdf(first) == b"%PDF first"
+
+
+def test_stale_job_is_requeued_and_claimed_again(store):
+    job_id = store.submit(b"%PDF")
+    assert store.claim("lost") == job_id
+    store.heartbeat(job_id, {"pages": {"done": 1, "total": 3}})
+    # A live heartbeat keeps the job with its worker
+    assert store.claim("other") is None
+
+    lose_worker(store, job_id)
+    assert store.claim("other") == job_id
+    job = store.get(job_id)
+    assert job["status"] == "running" and job["attempts"] == 2
+    assert job["progress"] == {}
+
+
+def test_job_fails_after_max_attempts_and_drops_its_pdf(store, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_MAX_ATTEMPTS", 2)
+    job_id = store.submit(b"%PDF")
+    for _ in range(2):
+        assert store.claim("lost") == job_id
+        lose_worker(store, job_id)
+    assert store.claim("other") is None
+    job = store.get(job_id)
+    assert job["status"] == "failed" and job["error"] == "Worker lost too many times"
+    assert spooled(store) == []
+
+
+def test_finish_stores_the_outcome_and_removes_the_pdf(store):
+    done, failed = store.submit(b"%PDF 1"), store.submit(b"%PDF 2")
+    store.claim("w")
+    store.claim("w")
+    store.finish(done, result={"labels": ["kira"]})
+    store.finish(failed, error="No readable text found in PDF")
+    assert store.get(done)["status"] == "done" and store.get(done)["result"] == {"labels": ["kira"]}
+    assert store.get(failed)["status"] == "failed" and store.get(failed)["error"] == "No readable text found in PDF"
+    assert spooled(store) == []
+
+
+def test_finished_jobs_are_purged_after_the_retention(store):
+    old, new = store.submit(b"%PDF old"), store.submit(b"%PDF new")
+    queued = store.submit(b"%PDF queued")
+    store.claim("w")
+    store.finish(old, result={"labels": []})
+    store._conn.execute("UPDATE jobs SET updated_at = updated_at - ? WHERE job_id = ?",
+                        (job_queue.JOB_RETENTION + 1, old))
+    store.claim("w")
+    store.finish(new, result={"labels": []})
+    assert store.get(old) is None
+    assert store.get(new)["status"] == "done"
+    assert store.get(queued)["status"] == "queued"
+    assert spooled(store) == [queued]
+
+
+def test_worker_pool_runs_jobs_and_records_progress(store, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_POLL_INTERVAL", 0.01)
+
+    async def handler(pdf_bytes, on_progress):
+        on_progress("pages", 1, 2)
+        on_progress("pages", 2, 2)
+        if pdf_bytes == b"%PDF bad":
+            raise ValueError("No readable text found in PDF")
+        return {"labels": [pdf_bytes.decode()]}
+
+    async def run():
+        pool = JobWorkerPool(store, handler, concurrency=2)
+        pool.start()
+        good = await asyncio.to_thread(store.submit, b"%PDF good")
+        bad = await asyncio.to_thread(store.submit, b"%PDF bad")
+        for _ in range(200):
+            if all(store.get(j)["status"] in ("done", "failed") for j in (good, bad)):
+                break
+            await asyncio.sleep(0.01)
+        await pool.stop()
+        return store.get(good), store.get(bad)
+
+    good, bad = asyncio.run(run())
+    assert good["status"] == "done" and good["result"] == {"labels": ["%PDF good"]}
+    assert good["progress"] == {"pages": {"done": 2, "total": 2}}
+    assert bad["status"] == "failed" and bad["error"] == "No readable text found in PDF"
+    assert spooled(store) == []
@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from services import label_utils
+from services.result_cache import PersistentLRUCache
+
+
+class FakeGroq:
+    """Answers every completion request with the next queued reply."""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages):
+        self.calls += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.replies.pop(0)))])
+
+
+@pytest.fixture
+def groq(monkeypatch, tmp_path):
+    def install(*replies):
+        client = FakeGroq(replies)
+        monkeypatch.setattr(label_utils, "async_client", SimpleNamespace(get=lambda: client))
+        return client
+
+    monkeypatch.setattr(label_utils, "llm_cache", PersistentLRUCache(str(tmp_path / "llm.sqlite3"), "1", 1 << 20))
+    return install
+
+
+def ask(content, accept=None):
+    report = {}
+    text = asyncio.run(label_utils.call_groq_async(
+        label_utils._messages(label_utils.LABEL_PROMPT, content), report=report, accept=accept
+    ))
+    return text, report["cache"]
+
+
+def test_parsed_completion_is_cached(groq):
+    client = groq('["Kira", "Sözleşme"]')
+    assert ask("kira sözleşmesi", label_utils._is_json_array) == ('["Kira", "Sözleşme"]', "miss")
+    assert ask("kira  sözleşmesi\n", label_utils._is_json_array) == ('["Kira", "Sözleşme"]', "hit")
+    assert client.calls == 1
+
+
+def test_rejected_completion_is_asked_again(groq):
+    client = groq("Üzgünüm, bu belgeyi etiketleyemiyorum.", '```json\n["Fatura"]\n```')
+    assert ask("fatura", label_utils._is_json_array)[1] == "miss"
+    text, cache = ask("fatura", label_utils._is_json_array)
+    assert cache == "miss" and label_utils.safe_json_extract(text) == ["Fatura"]
+    assert ask("fatura", label_utils._is_json_array)[1] == "hit"
+    assert client.calls == 2
+
+
+def test_json_array_check():
+    assert label_utils._is_json_array('Etiketler: ["a", "b"]')
+    assert not label_utils._is_json_array('{"labels": "a"}')
+    assert not label_utils._is_json_array("[a, b")
+    assert label_utils.safe_json_extract("no json") == []
@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+from services import result_cache
+from services.result_cache import PersistentLRUCache, pdf_key, text_key, llm_key
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "results.sqlite3")
+
+
+def stored_bytes(cache):
+    return cache._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+
+def test_round_trip_and_counters(path):
+    cache = PersistentLRUCache(path, "v1", 1 << 20)
+    assert cache.get("missing") is None
+    cache.set("k", {"labels": ["kira", "sözleşme"], "summary": "Özet"})
+    assert cache.get("k") == {"labels": ["kira", "sözleşme"], "summary": "Özet"}
+    stats = cache.stats()
+    assert stats["entries"] == 1 and stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["bytes"] == stored_bytes(cache)
+
+
+def test_keys_ignore_whitespace_only():
+    assert text_key("Kira  sözleşmesi\n") == text_key(" Kira sözleşmesi")
+    assert text_key("Kira sözleşmesi") != text_key("kira sözleşmesi")
+    assert pdf_key(b"%PDF-1") != pdf_key(b"%PDF-2")
+    assert llm_key("m", "prompt a", "text") != llm_key("m", "prompt b", "text")
+    assert llm_key("m", "prompt", "text") != llm_key("other", "prompt", "text")
+
+
+def test_another_version_purges_the_cache(path):
+    PersistentLRUCache(path, "v1", 1 << 20).set("k", "value")
+    assert PersistentLRUCache(path, "v1", 1 << 20).get("k") == "value"
+    bumped = PersistentLRUCache(path, "v2", 1 << 20)
+    assert bumped.get("k") is None
+    assert bumped.stats()["entries"] == 0 and bumped._bytes == 0
+
+
+def test_least_recently_used_entries_are_evicted(path):
+    cache = PersistentLRUCache(path, "v1", max_bytes=100)
+    for key in "abc":
+        cache.set(key, "x" * 28)  # 30 bytes of JSON each
+    cache._conn.execute("UPDATE entries SET accessed_at = accessed_at - 10 WHERE key IN ('a', 'b')")
+    assert cache.get("a") is not None  # a is now the most recently used
+    cache.set("d", "x" * 28)
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
+    assert cache._bytes == stored_bytes(cache) == 90
+
+    # Replacing an entry counts only its new size
+    cache.set("a", "y" * 8)
+    assert cache._bytes == stored_bytes(cache) == 70
+
+
+def test_entries_expire_after_max_age(path):
+    cache = PersistentLRUCache(path, "v1", 1 << 20, max_age=60)
+    cache.set("old", "value")
+    cache.set("older", "value")
+    cache._conn.execute("UPDATE entries SET created_at = created_at - 120")
+    assert cache.get("old") is None
+    # The next write purges the remaining expired entries
+    cache.set("new", "value")
+    assert cache.stats()["entries"] == 1
+    assert cache._bytes == stored_bytes(cache)
+
+
+def test_byte_total_is_recounted_for_other_writers(path, monkeypatch):
+    monkeypatch.setattr(result_cache, "CACHE_SIZE_RECOUNT_WRITES", 2)
+    cache = PersistentLRUCache(path, "v1", 1 << 20)
+    PersistentLRUCache(path, "v1", 1 << 20).set("elsewhere", "x" * 100)
+    cache.set("a", "value")
+    assert cache._bytes < stored_bytes(cache)
+    cache.set("b", "value")
+    assert cache._bytes == stored_bytes(cache)
+
+
+def test_clear_and_async_access(path):
+    cache = PersistentLRUCache(path, "v1", 1 << 20)
+
+    async def run():
+        await cache.aset("k", [1, 2])
+        return await cache.aget("k")
+
+    assert asyncio.run(run()) == [1, 2]
+    assert cache.clear() == 1
+    assert cache._bytes == 0 and cache.get("k") is None
@@ -0,0 +1,54 @@
+from services import text_layer
+
+
+def make_pdf(page_texts):
+    """Minimal PDF with one Helvetica text line per page ("" for a page without a text layer)."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in page_texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET" if text else ""
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return pdf
+
+
+def test_extracts_the_cleaned_text_of_every_page():
+    pdf = make_pdf(["Kira sozlesmesi bir yil sureyle yapilmistir.", "", "Ikinci sayfa"])
+    assert text_layer.extract_text_layer(pdf) == ["Kira sozlesmesi bir yil sureyle yapilmistir.", "", "Ikinci sayfa"]
+
+
+def test_unparseable_pdf_has_no_text_layer():
+    assert text_layer.extract_text_layer(b"not a pdf") == []
+
+
+def test_clean_pdf_text_joins_hyphenated_words_and_whitespace():
+    assert text_layer.clean_pdf_text("  söz-\n leşme   metni\n\n") == "sözleşme metni"
+
+
+def test_quality_counts_unmapped_glyphs_as_garbage():
+    assert text_layer.text_quality("") == 0.0
+    assert text_layer.text_quality("Fatura No: 2024/15, tutar 1.250 ₺") == 1.0
+    assert text_layer.text_quality("(cid:12)(cid:7)(cid:9) ab") < 0.2
+    assert text_layer.text_quality("���abc") == 0.5
+
+
+def test_is_usable_needs_enough_clean_text():
+    assert text_layer.is_usable("Bu sayfanın metin katmanı okunabilir durumda.")
+    # Too short: a page number or a stray header, OCR it
+    assert not text_layer.is_usable("Sayfa 1")
+    # Long enough but mostly unmapped glyphs
+    assert not text_layer.is_usable("(cid:3)(cid:4)(cid:5)(cid:6) metin (cid:7)(cid:8)(cid:9)")
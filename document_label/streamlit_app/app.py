@@ -1,7 +1,7 @@
+import hashlib
 import streamlit as st
-import tempfile
 import docx
-from gateway_api import analyze_document, confirm_document, semantic_search
+from gateway_api import analyze_document, confirm_document, semantic_search, ocr_document
 
 # docTR imports
 from doctr.io import DocumentFile
@@ -14,20 +14,27 @@ for key, default in {
     "text": "",
     "summary": "",
     "labels": [],
-    "analysis_done": False
+    "analysis_done": False,
+    "search_query": "",
+    "search_results": [],
+    "search_cursor": None
 }.items():
     if key not in st.session_state:
         st.session_state[key] = default
 
-# PDF → text via docTR
-def extract_text_from_pdf(uploaded_file):
-    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
-        tmp.write(uploaded_file.read())
-        tmp.flush()
-        doc = DocumentFile.from_pdf(tmp.name)
+# Loaded once per Streamlit server, shared by all sessions and reruns
+@st.cache_resource(show_spinner="Loading OCR model...")
+def get_ocr_model():
+    return ocr_predictor(pretrained=True)
 
-    model = ocr_predictor(pretrained=True)
-    result = model(doc)
+# PDF → text via docTR, memoized per file hash (the bytes themselves are not hashed again)
+@st.cache_data(show_spinner=False, max_entries=32)
+def ocr_pdf(file_hash, _pdf_bytes, remote):
+    if remote:
+        return "\n\n".join(ocr_document(f"{file_hash}.pdf", _pdf_bytes)).strip()
+
+    doc = DocumentFile.from_pdf(_pdf_bytes)
+    result = get_ocr_model()(doc)
 
     pages = []
     for page in result.pages:
@@ -40,6 +47,10 @@ def extract_text_from_pdf(uploaded_file):
 
     return "\n\n".join(pages).strip()
 
+def extract_text_from_pdf(uploaded_file, remote=False):
+    pdf_bytes = uploaded_file.getvalue()
+    return ocr_pdf(hashlib.sha256(pdf_bytes).hexdigest(), pdf_bytes, remote)
+
 # DOCX → text
 def extract_text_from_docx(uploaded_file):
     doc = docx.Document(uploaded_file)
@@ -47,6 +58,10 @@ def extract_text_from_docx(uploaded_file):
 
 # ---- UI Layout ----
 st.title("Document Labeling Gateway UI")
+remote_ocr = st.sidebar.checkbox(
+    "Run OCR on the labeling service",
+    help="Send PDFs to the labeling service for OCR instead of loading the model in this app"
+)
 tab1, tab2 = st.tabs(["Analyze & Confirm", "Semantic Search"])
 
 # --- Tab 1: Analyze & Confirm ---
@@ -58,7 +73,7 @@ with tab1:
         ext = uploaded_file.name.rsplit(".", 1)[-1].lower()
         with st.spinner("Performing OCR..."):
             if ext == "pdf":
-                st.session_state["text"] = extract_text_from_pdf(uploaded_file)
+                st.session_state["text"] = extract_text_from_pdf(uploaded_file, remote=remote_ocr)
             elif ext == "docx":
                 st.session_state["text"] = extract_text_from_docx(uploaded_file)
             else:
@@ -115,20 +130,51 @@ with tab1:
 with tab2:
     st.subheader("Search Documents Semantically")
     query = st.text_input("Enter your search query")
+    show_snippets = st.checkbox("Show matched passages", value=False)
+
+    def show_result(doc):
+        st.markdown(f"**Title:** {doc.get('title', 'Untitled')}")
+        if "snippets" in doc:
+            for snippet in doc["snippets"]:
+                st.caption(f"Page {snippet.get('page')}: {snippet['text']}")
+        else:
+            st.markdown(f"**Summary:** {doc.get('summary', '')}")
+            labels = doc.get("labels", [])
+            st.markdown(f"**Labels:** {labels if isinstance(labels, str) else ', '.join(labels)}")
+        st.markdown("---")
+
+    def fetch_results(cursor=None):
+        """Render results as they stream in; the page's cursor is kept for "More results"."""
+        for line in semantic_search(st.session_state["search_query"], cursor=cursor, snippets=show_snippets):
+            if "result" in line:
+                show_result(line["result"])
+                st.session_state["search_results"].append(line["result"])
+            elif line.get("error"):
+                st.error(f"Search failed: {line['error']}")
+            else:
+                st.session_state["search_cursor"] = line.get("next_cursor")
 
-    if st.button("Search"):
+    new_search = st.button("Search")
+    if new_search:
         if not query.strip():
             st.warning("Please enter a query.")
+            new_search = False
         else:
-            with st.spinner("Searching..."):
-                results = semantic_search(query)
-
-            if not results:
-                st.info("No results found.")
-            else:
-                st.markdown("#### Search Results")
-                for doc in results:
-                    st.markdown(f"**Title:** {doc.get('title', 'Untitled')}")
-                    st.markdown(f"**Summary:** {doc.get('summary', '')}")
-                    st.markdown(f"**Labels:** {', '.join(doc.get('labels', []))}")
-                    st.markdown("---")
+            st.session_state["search_query"] = query
+            st.session_state["search_results"] = []
+            st.session_state["search_cursor"] = None
+
+    if new_search or st.session_state["search_results"]:
+        st.markdown("#### Search Results")
+    for doc in st.session_state["search_results"]:
+        show_result(doc)
+
+    if new_search:
+        fetch_results()
+        if not st.session_state["search_results"]:
+            st.info("No results found.")
+        else:
+            st.rerun()
+    elif st.session_state["search_cursor"] and st.button("More results"):
+        fetch_results(st.session_state["search_cursor"])
+        st.rerun()
@@ -1,3 +1,4 @@
+import json
 import requests
 
 GATEWAY_URL = "http://localhost:1071"
@@ -6,6 +7,18 @@ def analyze_document(content:str):
     response = requests.post(f"{GATEWAY_URL}/analyze-document", json=content)
     return response.json()
 
+def ocr_document(filename: str, pdf_bytes: bytes):
+    """OCR on the labeling service; returns the page texts in page order."""
+    files = {"file": (filename, pdf_bytes, "application/pdf")}
+    pages = {}
+    with requests.post(f"{GATEWAY_URL}/ocr-document", files=files, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                page = json.loads(line)
+                pages[page["page"]] = page["text"]
+    return [pages[i] for i in sorted(pages)]
+
 def confirm_document(content:str, summary:str, labels: list[str]):
     payload = {
         "content": content,
@@ -14,5 +27,11 @@ def confirm_document(content:str, summary:str, labels: list[str]):
     }
     return requests.post(f"{GATEWAY_URL}/confirm-document", json= payload).json()
 
-def semantic_search(query: str):
-    return requests.post(f"{GATEWAY_URL}/search", json= {"query": query}).json()
+def semantic_search(query: str, top_k: int = 10, cursor: str = None, snippets: bool = False):
+    """Streamed search: yields each result as it arrives, then the final line carrying next_cursor."""
+    payload = {"query": query, "top_k": top_k, "cursor": cursor, "snippets": snippets, "stream": True}
+    with requests.post(f"{GATEWAY_URL}/search", json=payload, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)